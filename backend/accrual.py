@@ -0,0 +1,116 @@
+"""Scheduled accrual: materialize daily income and interest for all children.
+
+Request handlers still call run_catchup() lazily, but with the scheduler (or
+``flask accrue`` from cron) the ledger is normally already current, so they
+find nothing to do. After accruing, the scheduler also compacts newly closed
+months into monthly summaries (see rollup.py).
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+
+from catchup import run_catchup
+from models import Transaction, User, db
+from rollup import compact_all
+
+
+def accrue_all():
+    """Run catch-up for every child with an allowance. Returns the child count."""
+    children = db.session.execute(
+        db.select(User).filter(User.is_admin.is_(False), User.monthly_allowance_cents > 0)
+    ).scalars().all()
+    for child in children:
+        run_catchup(child)
+    return len(children)
+
+
+def _seconds_until(at, now=None):
+    """Seconds from ``now`` until the next local ``HH:MM``."""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in at.split(":"))
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _scheduler_loop(app):
+    while True:
+        time.sleep(_seconds_until(app.config["ACCRUAL_TIME"]))
+        with app.app_context():
+            try:
+                count = accrue_all()
+                app.logger.info("Accrued allowance for %d children", count)
+                written = compact_all()
+                app.logger.info("Wrote %d monthly summaries", written)
+            except Exception:
+                app.logger.exception("Scheduled accrual failed")
+            finally:
+                db.session.remove()
+
+
+def start_scheduler(app):
+    """Start the daily accrual thread for this process."""
+    thread = threading.Thread(
+        target=_scheduler_loop, args=(app,), name="accrual-scheduler", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def ledger_watermarks():
+    """Return {user_id: date of the user's latest income transaction}."""
+    rows = db.session.execute(
+        db.select(Transaction.user_id, db.func.max(Transaction.created_at))
+        .filter(Transaction.type == "income")
+        .group_by(Transaction.user_id)
+    ).all()
+    return {user_id: last_income.date() for user_id, last_income in rows}
+
+
+def find_watermark_mismatches():
+    """Return [(user, stored, ledger)] where accrued_through disagrees with the ledger."""
+    ledger = ledger_watermarks()
+    mismatches = []
+    for user in db.session.execute(db.select(User)).scalars():
+        expected = ledger.get(user.id)
+        if user.accrued_through != expected:
+            mismatches.append((user, user.accrued_through, expected))
+    return mismatches
+
+
+def repair_watermarks():
+    """Reset every user's accrued_through to their latest income date."""
+    for user, _, expected in find_watermark_mismatches():
+        user.accrued_through = expected
+    db.session.commit()
+
+
+@click.command("accrue")
+def accrue_command():
+    """Materialize daily income and month-end interest for all children."""
+    count = accrue_all()
+    click.echo(f"Accrued allowance for {count} children.")
+
+
+@click.command("repair-watermarks")
+@click.option(
+    "--check", is_flag=True, help="Only verify watermarks; exit 1 on mismatch"
+)
+def repair_watermarks_command(check):
+    """Reset accrual watermarks that disagree with the transaction ledger."""
+    mismatches = find_watermark_mismatches()
+    for user, stored, expected in mismatches:
+        click.echo(f"{user.username}: accrued_through {stored}, ledger {expected}")
+
+    if check:
+        if mismatches:
+            raise SystemExit(1)
+        click.echo("All accrual watermarks match the ledger.")
+        return
+
+    repair_watermarks()
+    click.echo(f"Repaired watermarks ({len(mismatches)} corrected).")
@@ -1,11 +1,19 @@
 from datetime import date, datetime
 from functools import wraps
 
-from flask import Blueprint, request
+from flask import Blueprint, current_app, request
 from flask_login import current_user, login_required
 
-from catchup import get_balance, run_catchup
+from auth import forget_user
+from catchup import get_balance, run_catchup_many
+from database import retry_on_locked
+from events import event_stream, latest_event_id, publish_request_event
+from instrumentation import endpoint_metrics, reset_metrics
+from metrics import WITHDRAWAL_RESOLUTION_SECONDS
+from ledger import add_transaction, touch_ledger
 from models import Transaction, User, WithdrawalRequest, db
+from money import to_cents, to_dollars
+from pagination import before, decode_cursor, encode_cursor
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -24,13 +32,54 @@ def admin_required(f):
 @admin_bp.route("/api/admin/users")
 @admin_required
 def list_users():
-    children = db.session.execute(
-        db.select(User).filter_by(is_admin=False)
-    ).scalars().all()
+    children_stmt = db.select(User).filter_by(is_admin=False)
+    children = db.session.execute(children_stmt).scalars().all()
+    if not children:
+        return []
+
+    run_catchup_many(children)
+    # Reload in one query; catch-up's commit expired the loaded rows
+    children = db.session.execute(children_stmt).scalars().all()
+    ids = [child.id for child in children]
+
+    request_stats = {
+        user_id: (pending, last_request)
+        for user_id, pending, last_request in db.session.execute(
+            db.select(
+                WithdrawalRequest.user_id,
+                db.func.sum(
+                    db.case((WithdrawalRequest.status == "pending", 1), else_=0)
+                ),
+                db.func.max(WithdrawalRequest.created_at),
+            )
+            .filter(WithdrawalRequest.user_id.in_(ids))
+            .group_by(WithdrawalRequest.user_id)
+        )
+    }
+    # Accrued income and interest are not activity; withdrawals and adjustments are
+    last_transaction = dict(
+        db.session.execute(
+            db.select(Transaction.user_id, db.func.max(Transaction.created_at))
+            .filter(
+                Transaction.user_id.in_(ids),
+                Transaction.type.in_(("withdrawal", "adjustment")),
+            )
+            .group_by(Transaction.user_id)
+        ).all()
+    )
+
     result = []
     for child in children:
-        run_catchup(child)
-        result.append({**child.to_dict(), "balance": get_balance(child)})
+        pending, last_request = request_stats.get(child.id, (0, None))
+        activity = [t for t in (last_request, last_transaction.get(child.id)) if t]
+        result.append(
+            {
+                **child.to_dict(),
+                "balance": to_dollars(get_balance(child)),
+                "pending_requests": pending,
+                "last_activity": max(activity).isoformat() if activity else None,
+            }
+        )
     return result
 
 
@@ -54,8 +103,8 @@ def create_user():
         username=data["username"],
         display_name=data["display_name"],
         is_admin=False,
-        monthly_allowance=float(data.get("monthly_allowance", 0)),
-        starting_balance=float(data.get("starting_balance", 0)),
+        monthly_allowance_cents=to_cents(data.get("monthly_allowance", 0)),
+        starting_balance_cents=to_cents(data.get("starting_balance", 0)),
         allowance_start_date=date.fromisoformat(data["allowance_start_date"]) if data.get("allowance_start_date") else None,
     )
     user.set_password(data["password"])
@@ -79,42 +128,94 @@ def update_user(user_id):
     if "display_name" in data:
         user.display_name = data["display_name"]
     if "monthly_allowance" in data:
-        user.monthly_allowance = float(data["monthly_allowance"])
+        user.monthly_allowance_cents = to_cents(data["monthly_allowance"])
     if "starting_balance" in data:
-        user.starting_balance = float(data["starting_balance"])
+        user.starting_balance_cents = to_cents(data["starting_balance"])
     if "allowance_start_date" in data:
         user.allowance_start_date = date.fromisoformat(data["allowance_start_date"]) if data["allowance_start_date"] else None
+    if {"monthly_allowance", "starting_balance", "allowance_start_date"} & data.keys():
+        # Let the next catch-up re-check the ledger under the new settings
+        user.accrued_through = None
     if data.get("password"):
         user.set_password(data["password"])
 
     db.session.commit()
+    forget_user(user.id)
     return user.to_dict()
 
 
 @admin_bp.route("/api/admin/requests")
 @admin_required
 def list_requests():
+    """List withdrawal requests, newest first.
+
+    Without ``limit`` the whole list is returned. With ``limit`` the response
+    is one page, ``{"requests": [...], "next_cursor": ...}``, and the cursor
+    is passed back as ``cursor`` to fetch the next page. The first page also
+    has ``last_event_id``: the request event stream resumed from it sends
+    every change the list does not show yet.
+    """
     status_filter = request.args.get("status", "pending")
-    stmt = db.select(WithdrawalRequest)
+    limit = request.args.get("limit", None, type=int)
+    cursor = request.args.get("cursor", None)
+
+    stmt = db.select(WithdrawalRequest).options(db.joinedload(WithdrawalRequest.user))
     if status_filter != "all":
         stmt = stmt.filter_by(status=status_filter)
-    requests_list = db.session.execute(
-        stmt.order_by(WithdrawalRequest.created_at.desc())
-    ).scalars().all()
+    if cursor:
+        try:
+            created_at, request_id, _ = decode_cursor(cursor)
+        except ValueError:
+            return {"error": "Invalid cursor"}, 400
+        stmt = stmt.filter(before(WithdrawalRequest, created_at, request_id))
+    stmt = stmt.order_by(WithdrawalRequest.created_at.desc(), WithdrawalRequest.id.desc())
+    if limit is not None:
+        if limit < 1:
+            return {"error": "limit must be positive"}, 400
+        # One extra row tells us whether there is a next page
+        stmt = stmt.limit(limit + 1)
+
+    # Read before the list: a change made in between is then both listed
+    # and streamed, which the page handles, rather than lost
+    last_event_id = latest_event_id() if limit is not None and not cursor else None
+    requests_list = db.session.execute(stmt).scalars().all()
+
+    next_cursor = None
+    if limit is not None and len(requests_list) > limit:
+        requests_list = requests_list[:limit]
+        last = requests_list[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    result = [
+        {**wr.to_dict(), "child_name": wr.user.display_name if wr.user else "Unknown"}
+        for wr in requests_list
+    ]
+    if limit is None:
+        return result
+    page = {"requests": result, "next_cursor": next_cursor}
+    if last_event_id is not None:
+        page["last_event_id"] = last_event_id
+    return page
+
+
+@admin_bp.route("/api/admin/requests/stream")
+@admin_required
+def stream_requests():
+    """Stream ``created`` and ``resolved`` request events as server-sent events.
 
-    result = []
-    for wr in requests_list:
-        child = db.session.get(User, wr.user_id)
-        result.append(
-            {**wr.to_dict(), "child_name": child.display_name if child else "Unknown"}
-        )
-    return result
+    Each event's data is the request as list_requests() returns it. See
+    events.py for resuming with ``Last-Event-ID``.
+    """
+    return event_stream()
 
 
 @admin_bp.route("/api/admin/requests/<int:request_id>", methods=["PUT"])
 @admin_required
+@retry_on_locked
 def resolve_request(request_id):
-    wr = db.session.get(WithdrawalRequest, request_id)
+    wr = db.session.get(
+        WithdrawalRequest, request_id, options=[db.joinedload(WithdrawalRequest.user)]
+    )
     if not wr:
         return {"error": "Request not found"}, 404
     if wr.status != "pending":
@@ -129,30 +230,37 @@ def resolve_request(request_id):
     wr.resolved_by = current_user.id
 
     if data["status"] == "approved":
-        amount = data.get("amount", wr.amount)
+        amount = data.get("amount", to_dollars(wr.amount_cents))
         try:
-            amount = float(amount)
-        except (TypeError, ValueError):
+            amount_cents = to_cents(amount)
+        except ValueError:
             return {"error": "Invalid amount"}, 400
 
-        if amount <= 0:
+        if amount_cents <= 0:
             return {"error": "Amount must be positive"}, 400
 
-        wr.amount = round(amount, 2)
+        wr.amount_cents = amount_cents
         txn = Transaction(
             user_id=wr.user_id,
             type="withdrawal",
-            amount=wr.amount,
+            amount_cents=wr.amount_cents,
             description=f"Withdrawal: {wr.reason}" if wr.reason else "Withdrawal",
         )
-        db.session.add(txn)
+        add_transaction(txn)
+    else:
+        touch_ledger(wr.user_id)
 
+    publish_request_event("resolved", wr, wr.user.display_name if wr.user else "Unknown")
     db.session.commit()
+    WITHDRAWAL_RESOLUTION_SECONDS.observe(
+        (wr.resolved_at - wr.created_at).total_seconds(), status=wr.status
+    )
     return wr.to_dict()
 
 
 @admin_bp.route("/api/admin/users/<int:user_id>/adjust", methods=["POST"])
 @admin_required
+@retry_on_locked
 def adjust_balance(user_id):
     user = db.session.get(User, user_id)
     if not user or user.is_admin:
@@ -163,11 +271,11 @@ def adjust_balance(user_id):
         return {"error": "Amount is required"}, 400
 
     try:
-        amount = float(data["amount"])
+        amount_cents = to_cents(data["amount"])
     except ValueError:
         return {"error": "Invalid amount"}, 400
 
-    if amount == 0:
+    if amount_cents == 0:
         return {"error": "Amount cannot be zero"}, 400
 
     description = data.get("description", "Manual adjustment")
@@ -175,10 +283,27 @@ def adjust_balance(user_id):
     txn = Transaction(
         user_id=user.id,
         type="adjustment",
-        amount=amount,
+        amount_cents=amount_cents,
         description=description,
     )
-    db.session.add(txn)
+    add_transaction(txn)
     db.session.commit()
 
-    return {"balance": get_balance(user)}, 200
+    return {"balance": to_dollars(get_balance(user))}, 200
+
+
+@admin_bp.route("/api/admin/metrics")
+@admin_required
+def metrics():
+    """Per-endpoint query counts and timings collected by this worker."""
+    return {
+        "enabled": current_app.config["SQL_INSTRUMENTATION"],
+        "endpoints": endpoint_metrics(),
+    }
+
+
+@admin_bp.route("/api/admin/metrics", methods=["DELETE"])
+@admin_required
+def clear_metrics():
+    reset_metrics()
+    return "", 204
@@ -1,11 +1,14 @@
-import os
-
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from flask_login import LoginManager
 
 from config import Config
-from models import User, db
+from database import configure_sqlite
+from instrumentation import init_instrumentation
+from metrics import init_metrics
+from migrations import upgrade_schema
+from models import db
+from static_files import init_static
 
 
 def create_app():
@@ -13,23 +16,23 @@ def create_app():
     app.config.from_object(Config)
 
     db.init_app(app)
+    init_instrumentation(app)
+    init_metrics(app)
     CORS(app, supports_credentials=True)
 
     login_manager = LoginManager()
     login_manager.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return db.session.get(User, int(user_id))
-
     @login_manager.unauthorized_handler
     def unauthorized():
         return {"error": "Not authenticated"}, 401
 
     # Register blueprints
     from admin import admin_bp
-    from auth import auth_bp
+    from auth import auth_bp, load_user
     from dashboard import dashboard_bp
+    from export import export_bp
+    from projection import projection_bp
     from transactions import transactions_bp
     from withdrawals import withdrawals_bp
 
@@ -38,32 +41,39 @@ def create_app():
     app.register_blueprint(transactions_bp)
     app.register_blueprint(withdrawals_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(export_bp)
+    app.register_blueprint(projection_bp)
+
+    login_manager.user_loader(load_user)
 
-    # Seed CLI command
+    # CLI commands
+    from accrual import accrue_command, repair_watermarks_command
+    from ledger import rebuild_balances_command
+    from rollup import compact_command
     from seed import seed_command
 
     app.cli.add_command(seed_command)
+    app.cli.add_command(rebuild_balances_command)
+    app.cli.add_command(accrue_command)
+    app.cli.add_command(repair_watermarks_command)
+    app.cli.add_command(compact_command)
 
-    # Serve SvelteKit static build
-    static_dir = os.path.abspath(app.config["STATIC_FOLDER"])
-
-    @app.route("/", defaults={"path": ""})
-    @app.route("/<path:path>")
-    def serve_frontend(path):
-        full_path = os.path.join(static_dir, path)
-        if path and os.path.isfile(full_path):
-            return send_from_directory(static_dir, path)
-        fallback = os.path.join(static_dir, "200.html")
-        if os.path.isfile(fallback):
-            return send_from_directory(static_dir, "200.html")
-        return "Frontend not built yet. Run 'npm run build' in the frontend directory.", 404
+    # Serve the SvelteKit static build
+    init_static(app)
 
     with app.app_context():
+        configure_sqlite(app)
         db.create_all()
+        upgrade_schema()
+
+    # Background jobs are started by gunicorn.conf.py in one worker only
 
     return app
 
 
 if __name__ == "__main__":
+    from jobs import start_jobs
+
     app = create_app()
+    start_jobs(app)
     app.run(debug=True, port=5000)
@@ -1,10 +1,65 @@
-from flask import Blueprint, request
+import threading
+import time
+
+from flask import Blueprint, current_app, request
 from flask_login import current_user, login_required, login_user, logout_user
+from sqlalchemy.orm import make_transient_to_detached
 
 from models import User, db
 
 auth_bp = Blueprint("auth", __name__)
 
+# Columns rewritten by ledger and catch-up writes from any worker, plus the
+# settings catch-up reads (a parent may change them in another worker, where
+# forget_user() cannot reach this cache); never served from the identity cache
+LEDGER_ATTRS = (
+    "balance_cents",
+    "ledger_version",
+    "ledger_updated_at",
+    "accrued_through",
+    "monthly_allowance_cents",
+    "starting_balance_cents",
+    "allowance_start_date",
+)
+
+# {user_id: (expires_at, detached User)}
+_identity_cache = {}
+_identity_lock = threading.Lock()
+
+
+def load_user(user_id):
+    """Flask-Login user loader with a short-lived per-process identity cache.
+
+    A cached user is merged into the session without a query. Its ledger
+    columns are expired, so they are read fresh only by requests that use
+    them.
+    """
+    ttl = current_app.config["LOGIN_CACHE_SECONDS"]
+    if ttl <= 0:
+        return db.session.get(User, int(user_id))
+
+    now = time.monotonic()
+    with _identity_lock:
+        cached = _identity_cache.get(user_id)
+    if cached and cached[0] > now:
+        user = db.session.merge(cached[1], load=False)
+        db.session.expire(user, LEDGER_ATTRS)
+        return user
+
+    user = db.session.get(User, int(user_id))
+    if user:
+        copy = User(**{c.key: getattr(user, c.key) for c in User.__table__.columns})
+        make_transient_to_detached(copy)
+        with _identity_lock:
+            _identity_cache[user_id] = (now + ttl, copy)
+    return user
+
+
+def forget_user(user_id):
+    """Drop a user from this process's identity cache after changing them."""
+    with _identity_lock:
+        _identity_cache.pop(str(user_id), None)
+
 
 @auth_bp.route("/api/login", methods=["POST"])
 def login():
@@ -16,6 +71,11 @@ def login():
     if not user or not user.check_password(data["password"]):
         return {"error": "Invalid username or password"}, 401
 
+    if user.password_needs_rehash():
+        user.set_password(data["password"])
+        db.session.commit()
+        forget_user(user.id)
+
     login_user(user, remember=True)
     return {"ok": True, "user": user.to_dict()}
 
@@ -0,0 +1,774 @@
+"""Benchmarks for the allowance backend; pass/fail checks live in tests/.
+
+Run from the backend directory against a throwaway database:
+
+    python bench.py catchup --years 1 --years 5 --years 20
+    python bench.py export --years 1 --years 10
+    python bench.py projection --scenarios 10
+    python bench.py load --workers 1 --workers 2 --workers 4
+    python bench.py suite --output results.json --compare baseline.json
+    python bench.py static
+    python bench.py events
+    python bench.py login
+"""
+
+import gzip
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import click
+import requests as http_requests
+from sqlalchemy import event
+
+from app import create_app
+from config import Config
+from catchup import annotate_running_balance, get_balance, run_catchup
+from ledger import add_transaction, forget_balances
+from models import Transaction, User, WithdrawalRequest, db
+from money import to_cents
+from projection import project
+from rollup import compact_all
+from schedule import build_schedule, current_rates
+
+# Slowdowns smaller than this are timer noise, whatever their ratio
+REGRESSION_FLOOR_MS = 0.1
+
+
+def _make_child(username, years, monthly_allowance=20.0, starting_balance=0.0):
+    user = User(
+        username=username,
+        display_name=username,
+        monthly_allowance_cents=to_cents(monthly_allowance),
+        starting_balance_cents=to_cents(starting_balance),
+        allowance_start_date=date.today() - timedelta(days=round(365.25 * years)),
+    )
+    user.password_hash = "!"
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _login(client, username, password="bench"):
+    client.post("/api/logout")
+    response = client.post(
+        "/api/login", json={"username": username, "password": password}
+    )
+    assert response.status_code == 200, response.get_json()
+
+
+def _remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+
+@click.group()
+@click.pass_context
+def cli(ctx):
+    """Allowance backend benchmarks."""
+    # Never point a benchmark at the real database. The URL is also exported
+    # for the gunicorn servers some commands start.
+    fd, path = tempfile.mkstemp(prefix="allowance-bench-", suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+    ctx.call_on_close(lambda: _remove_database(path))
+
+
+@cli.command("catchup")
+@click.option(
+    "--years", "years_list", type=float, multiple=True, default=(1, 5, 20),
+    help="Years of backfill to benchmark (repeatable)",
+)
+@click.option("--allowance", type=float, default=20.0, help="Monthly allowance")
+@click.option("--starting-balance", type=float, default=-15.0, help="Starting balance")
+def catchup_command(years_list, allowance, starting_balance):
+    """Time the per-day and bulk catch-up paths over long backfills."""
+    app = create_app()
+    with app.app_context():
+        for years in years_list:
+            timings = {}
+            for mode, bulk in (("per_day", False), ("bulk", True)):
+                user = _make_child(
+                    f"bench-{mode}-{years}", years, allowance, starting_balance
+                )
+                started = time.perf_counter()
+                run_catchup(user, bulk=bulk)
+                timings[mode] = time.perf_counter() - started
+            rows = db.session.execute(
+                db.select(db.func.count())
+                .select_from(Transaction)
+                .filter_by(user_id=user.id)
+            ).scalar()
+
+            click.echo(
+                f"{years:>5g}y  rows={rows:<6d} "
+                f"per_day={timings['per_day']:8.3f}s  bulk={timings['bulk']:8.3f}s  "
+                f"speedup={timings['per_day'] / timings['bulk']:6.1f}x"
+            )
+
+
+def _read_export(client, url):
+    """Return (records, seconds) for one streamed NDJSON export."""
+    started = time.perf_counter()
+    response = client.get(url)
+    chunks = list(response.iter_encoded())
+    seconds = time.perf_counter() - started
+    response.close()
+    assert response.status_code == 200, url
+    return [json.loads(line) for line in b"".join(chunks).splitlines()], seconds
+
+
+def _export_peak(client, url):
+    """Return the most memory (bytes) an export allocated for any one chunk."""
+    tracemalloc.start()
+    response = client.get(url)
+    chunks = response.iter_encoded()
+    peak = tracemalloc.get_traced_memory()[1]
+    while True:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        # Chunks are dropped at once so only the export's memory is traced
+        if next(chunks, None) is None:
+            break
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    response.close()
+    return peak
+
+
+@cli.command("export")
+@click.option(
+    "--years", "years_list", type=float, multiple=True, default=(1, 10),
+    help="Years of history to export (repeatable)",
+)
+def export_command(years_list):
+    """Time streamed exports and trace their peak memory.
+
+    Peak memory (traced over a CSV export) should not grow with the length
+    of the history.
+    """
+    app = create_app()
+    client = app.test_client()
+    for years in years_list:
+        with app.app_context():
+            user = _make_child(f"bench-export-{years}", years, starting_balance=-15.0)
+            user.set_password("bench")
+            db.session.commit()
+            run_catchup(user)
+            username = user.username
+
+        _login(client, username)
+        records, seconds = _read_export(client, "/api/export?format=ndjson")
+        peak = _export_peak(client, "/api/export?format=csv")
+        click.echo(
+            f"{years:>5g}y  rows={len(records):<6d} {seconds:7.3f}s  "
+            f"{len(records) / seconds:9.0f} rows/s  peak={peak / 1024:7.1f} KiB"
+        )
+
+
+@cli.command("projection")
+@click.option("--scenarios", type=int, default=10, help="Withdrawal scenarios to project")
+def projection_command(scenarios):
+    """Time a 10-year projection with several withdrawal scenarios."""
+    app = create_app()
+    with app.app_context():
+        today = date.today()
+        ten_years = build_schedule(2000, today, today + timedelta(days=3652))
+        amounts = [500 * i for i in range(scenarios)]
+        timings = _timings(
+            lambda: project(-1500, ten_years, current_rates(), amounts), repeat=20
+        )
+    click.echo(
+        f"10-year projection, {scenarios} scenarios: "
+        f"median {statistics.median(timings) * 1000:.2f} ms"
+    )
+
+
+@cli.command("login")
+@click.option(
+    "--method", "methods", multiple=True,
+    default=("scrypt:32768:8:1", "scrypt:16384:8:1", "pbkdf2:sha256:600000"),
+    help="Password hash methods to compare (repeatable)",
+)
+@click.option("--logins", type=int, default=20, help="Logins timed per method")
+def login_command(methods, logins):
+    """Time logins at each password hash cost.
+
+    Also times an authenticated request with and without the identity cache.
+    """
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        for method in methods:
+            app.config["PASSWORD_HASH_METHOD"] = method
+            user = User(username=f"bench-login-{method}", display_name="Login")
+            user.set_password("bench")
+            db.session.add(user)
+            db.session.commit()
+            samples = _timings(lambda: _login(client, user.username), logins)
+            click.echo(
+                f"{method:<24s} logins/s={logins / sum(samples):7.1f}  "
+                f"median={statistics.median(samples) * 1000:7.1f}ms"
+            )
+        engine = db.engine
+
+    # Outside the app context, so each request gets a fresh session
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for ttl in (0, 60):
+        app.config["LOGIN_CACHE_SECONDS"] = ttl
+        client.get("/api/me")
+        statements.clear()
+        event.listen(engine, "after_cursor_execute", count)
+        try:
+            samples = _timings(lambda: client.get("/api/me"), logins)
+        finally:
+            event.remove(engine, "after_cursor_execute", count)
+        click.echo(
+            f"GET /api/me cache={'on ' if ttl else 'off'}  "
+            f"median={statistics.median(samples) * 1000:6.2f}ms  "
+            f"queries/request={len(statements) / logins:.1f}"
+        )
+
+
+def _static_build(root):
+    """Write a small stand-in SvelteKit build with precompressed assets."""
+    script = ("export const answer = 42;\n" * 400).encode()
+    files = {
+        "200.html": b"<!doctype html><title>Allowance</title>",
+        "favicon.png": b"\x89PNG stand-in",
+        "_app/version.json": b'{"version":"1"}',
+        "_app/immutable/entry/start.abc123.js": script,
+    }
+    for name, content in files.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+    asset = os.path.join(root, "_app/immutable/entry/start.abc123.js")
+    with open(asset + ".gz", "wb") as f:
+        f.write(gzip.compress(script))
+    # No brotli encoder in the standard library; the timings only need a file
+    with open(asset + ".br", "wb") as f:
+        f.write(b"brotli stand-in")
+
+
+@cli.command("static")
+@click.option("--requests", "count", type=int, default=2000, help="Requests per timing")
+def static_command(count):
+    """Time asset, 304 and SPA fallback requests against a stand-in build."""
+    root = tempfile.mkdtemp(prefix="allowance-static-")
+    try:
+        _static_build(root)
+        Config.STATIC_FOLDER = root
+        app = create_app()
+        client = app.test_client()
+        asset = "/_app/immutable/entry/start.abc123.js"
+        etag = client.get(asset).headers["ETag"]
+
+        timed = [
+            ("asset (br)", asset, {"Accept-Encoding": "gzip, br"}),
+            ("asset 304", asset, {"If-None-Match": etag}),
+            ("SPA fallback", "/transactions", {}),
+        ]
+        for name, url, headers in timed:
+            started = time.perf_counter()
+            for _ in range(count):
+                client.get(url, headers=headers).close()
+            elapsed = time.perf_counter() - started
+            click.echo(
+                f"{name:<14s} {count / elapsed:8.0f} req/s  "
+                f"{elapsed / count * 1e6:6.1f} us/request"
+            )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_gunicorn(workers, threads):
+    """Start gunicorn on the benchmark database; returns (process, base URL)."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "-w", str(workers), "--threads", str(threads),
+            "-b", f"127.0.0.1:{port}", "app:create_app()",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            http_requests.get(f"{base_url}/api/me", timeout=5)
+            return process, base_url
+        except http_requests.RequestException:
+            time.sleep(0.1)
+    process.terminate()
+    raise click.ClickException("gunicorn did not start")
+
+
+def _load_client(base_url, username, deadline, is_admin, results):
+    """Issue a read-heavy mix of requests until ``deadline``."""
+    http = http_requests.Session()
+    http.post(f"{base_url}/api/login", json={"username": username, "password": "bench"})
+    rng = random.Random(username)
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        if is_admin:
+            pending = http.get(f"{base_url}/api/admin/requests")
+            if pending.ok and pending.json():
+                response = http.put(
+                    f"{base_url}/api/admin/requests/{pending.json()[0]['id']}",
+                    json={"status": rng.choice(("approved", "denied"))},
+                )
+            else:
+                response = http.get(f"{base_url}/api/admin/users")
+        else:
+            roll = rng.random()
+            if roll < 0.1:
+                response = http.post(
+                    f"{base_url}/api/withdrawals", json={"amount": 1, "reason": "load"}
+                )
+            elif roll < 0.5:
+                response = http.get(f"{base_url}/api/transactions?page=2")
+            else:
+                response = http.get(f"{base_url}/api/dashboard")
+        results.append((time.perf_counter() - started, response.status_code))
+
+
+def _run_load(base_url, clients, children, duration):
+    """Run ``clients`` concurrent clients for ``duration`` seconds.
+
+    Returns [(latency seconds, status code)] for every request made.
+    """
+    results = []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=_load_client,
+            args=(
+                base_url,
+                "load-parent" if i == 0 else f"load-child-{i % children}",
+                deadline,
+                i == 0,
+                results,
+            ),
+        )
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@cli.command("load")
+@click.option(
+    "--workers", "workers_list", type=int, multiple=True, default=(1, 2, 4),
+    help="gunicorn worker counts to compare (repeatable)",
+)
+@click.option("--threads", type=int, default=4, help="Threads per worker")
+@click.option("--clients", type=int, default=16, help="Concurrent clients")
+@click.option("--children", type=int, default=8, help="Children to create")
+@click.option("--duration", type=float, default=10.0, help="Seconds per run")
+@click.option("--warmup", type=float, default=3.0, help="Unmeasured seconds first")
+def load_command(workers_list, threads, clients, children, duration, warmup):
+    """Measure API throughput under concurrent load for each worker count.
+
+    Runs real gunicorn servers on the benchmark database. One client acts as
+    the parent resolving requests; the rest are children reading their
+    dashboard and history and filing withdrawals.
+    """
+    app = create_app()
+    with app.app_context():
+        admin = User(username="load-parent", display_name="Parent", is_admin=True)
+        admin.set_password("bench")
+        db.session.add(admin)
+        for i in range(children):
+            child = _make_child(f"load-child-{i}", 2)
+            child.set_password("bench")
+            run_catchup(child)
+        db.session.commit()
+
+    click.echo(f"cpus={os.cpu_count()}  threads={threads}  clients={clients}")
+    for workers in workers_list:
+        process, base_url = _start_gunicorn(workers, threads)
+        try:
+            # Let every worker boot and warm its caches before measuring
+            _run_load(base_url, clients, children, warmup)
+            results = _run_load(base_url, clients, children, duration)
+        finally:
+            process.terminate()
+            process.wait()
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status >= 500)
+        click.echo(
+            f"workers={workers:<2d} requests={len(results):<6d} "
+            f"rps={len(results) / duration:7.1f}  "
+            f"p50={latencies[len(latencies) // 2] * 1000:6.1f}ms  "
+            f"p95={latencies[int(len(latencies) * 0.95)] * 1000:6.1f}ms  "
+            f"errors={errors}"
+        )
+        if errors:
+            raise SystemExit(1)
+
+
+def _read_stream(response, received):
+    """Append (id, type, data, arrival time) for each server-sent event."""
+    fields = {}
+    try:
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if line.startswith(":"):
+                continue
+            if line:
+                name, _, value = line.partition(":")
+                fields[name] = value.removeprefix(" ")
+            elif "event" in fields:
+                data = json.loads(fields["data"])
+                received.append(
+                    (fields.get("id"), fields["event"], data, time.perf_counter())
+                )
+                fields = {}
+            else:
+                fields = {}
+    except Exception:
+        # The caller closed the response under us
+        pass
+
+
+def _open_stream(http, base_url):
+    """Open the request event stream and read it in a thread.
+
+    Returns (response, received); the thread ends with the stream.
+    """
+    response = http.get(f"{base_url}/api/admin/requests/stream", stream=True, timeout=30)
+    assert response.status_code == 200, response.status_code
+    received = []
+    threading.Thread(target=_read_stream, args=(response, received), daemon=True).start()
+    return response, received
+
+
+def _wait_for(received, count, timeout=10):
+    deadline = time.monotonic() + timeout
+    while len(received) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return len(received) >= count
+
+
+@cli.command("events")
+@click.option("--workers", type=int, default=2, help="gunicorn workers")
+@click.option("--requests", "count", type=int, default=20, help="Withdrawals to file")
+def events_command(workers, count):
+    """Time live request events across gunicorn workers.
+
+    A parent streams /api/admin/requests/stream while a child files
+    withdrawals and the parent resolves them, each request landing on any
+    worker. Reports how long each change took to arrive and how quickly
+    another request is answered while the stream is open.
+    """
+    app = create_app()
+    with app.app_context():
+        admin = User(username="events-parent", display_name="Parent", is_admin=True)
+        admin.set_password("bench")
+        db.session.add(admin)
+        child = _make_child("events-child", 0)
+        child.set_password("bench")
+        db.session.commit()
+
+    os.environ.update(EVENTS_HEARTBEAT_SECONDS="1", EVENTS_POLL_SECONDS="0.2")
+    process, base_url = _start_gunicorn(workers, 4)
+    try:
+        parent = http_requests.Session()
+        parent.post(
+            f"{base_url}/api/login", json={"username": "events-parent", "password": "bench"}
+        )
+        kid = http_requests.Session()
+        kid.post(
+            f"{base_url}/api/login", json={"username": "events-child", "password": "bench"}
+        )
+
+        response, received = _open_stream(parent, base_url)
+        # Let the stream's worker load its buffer before anything is filed
+        time.sleep(0.5)
+        # When each write was sent, in the order its event should arrive
+        sent = []
+        for i in range(count):
+            sent.append(time.perf_counter())
+            created = kid.post(
+                f"{base_url}/api/withdrawals", json={"amount": 1, "reason": f"e{i}"}
+            ).json()
+            if i % 2:
+                sent.append(time.perf_counter())
+                parent.put(
+                    f"{base_url}/api/admin/requests/{created['id']}",
+                    json={"status": "approved" if i % 4 == 1 else "denied"},
+                )
+
+        started = time.perf_counter()
+        parent.get(f"{base_url}/api/admin/users")
+        api_ms = (time.perf_counter() - started) * 1000
+
+        _wait_for(received, len(sent))
+        response.close()
+        lags = sorted(
+            (arrived - at) * 1000 for at, (_, _, _, arrived) in zip(sent, received)
+        )
+        if not lags:
+            raise click.ClickException("no events arrived")
+        click.echo(
+            f"events={len(received)}/{len(sent)}  lag p50={lags[len(lags) // 2]:.1f}ms  "
+            f"max={lags[-1]:.1f}ms  API with stream open={api_ms:.1f}ms"
+        )
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _synthetic_family(rng, children, years, events_per_month):
+    """Create a parent and ``children`` kids with ``years`` of history each.
+
+    Every child gets withdrawals (with their approved requests), adjustments
+    and a few pending requests before catch-up fills in income and interest.
+    """
+    parent = User(username="suite-parent", display_name="Parent", is_admin=True)
+    parent.set_password("bench")
+    db.session.add(parent)
+    db.session.flush()
+
+    now = datetime.now()
+    days_back = round(365.25 * years)
+    kids = []
+    for i in range(children):
+        child = _make_child(
+            f"suite-child-{i}",
+            years,
+            monthly_allowance=rng.choice((5, 10, 20, 40)),
+            starting_balance=rng.randint(-20, 50),
+        )
+        child.set_password("bench")
+        for _ in range(round(events_per_month * 12 * years)):
+            created_at = now - timedelta(seconds=rng.randint(0, days_back * 86_400))
+            amount_cents = rng.randint(100, 2_000)
+            if rng.random() < 0.7:
+                db.session.add(
+                    WithdrawalRequest(
+                        user_id=child.id,
+                        amount_cents=amount_cents,
+                        reason="synthetic",
+                        status="approved",
+                        created_at=created_at,
+                        resolved_at=created_at,
+                        resolved_by=parent.id,
+                    )
+                )
+                txn_type = "withdrawal"
+            else:
+                txn_type = "adjustment"
+                amount_cents = rng.choice((amount_cents, -amount_cents))
+            add_transaction(
+                Transaction(
+                    user_id=child.id,
+                    type=txn_type,
+                    amount_cents=amount_cents,
+                    created_at=created_at,
+                )
+            )
+        for _ in range(rng.randint(0, 3)):
+            db.session.add(
+                WithdrawalRequest(user_id=child.id, amount_cents=500, reason="pending")
+            )
+        db.session.commit()
+        run_catchup(child)
+        kids.append(child)
+    compact_all()
+    return parent, kids
+
+
+def _timings(fn, repeat, setup=None):
+    """Call ``fn`` ``repeat`` times; return the seconds each call took."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@cli.command("suite")
+@click.option("--children", type=int, default=4, help="Children in the family")
+@click.option("--years", type=float, default=5, help="Years of history per child")
+@click.option("--events", type=float, default=4, help="Withdrawals/adjustments per month")
+@click.option("--repeat", type=int, default=20, help="Timed runs per benchmark")
+@click.option("--seed", type=int, default=0, help="Random seed for the family")
+@click.option(
+    "--output", type=click.Path(dir_okay=False), default="bench-results.json",
+    help="Where to write the JSON results",
+)
+@click.option(
+    "--compare", type=click.Path(exists=True, dir_okay=False), default=None,
+    help="Earlier results to compare against",
+)
+@click.option(
+    "--threshold", type=float, default=1.25,
+    help="Median slowdown ratio reported as a regression",
+)
+def suite_command(children, years, events, repeat, seed, output, compare, threshold):
+    """Time the hot endpoints and ledger functions on a synthetic family.
+
+    Endpoints are called through the Flask test client with warm caches;
+    run_catchup is timed on a fresh child for every run. Exits non-zero
+    if --compare finds a median more than --threshold times slower.
+    """
+    rng = random.Random(seed)
+    app = create_app()
+    results = {}
+    with app.app_context():
+        started = time.perf_counter()
+        _, kids = _synthetic_family(rng, children, years, events)
+        setup_seconds = time.perf_counter() - started
+        child = kids[0]
+        txns = db.session.execute(
+            db.select(Transaction)
+            .filter_by(user_id=child.id)
+            .order_by(Transaction.created_at, Transaction.id)
+        ).scalars().all()
+
+        client = app.test_client()
+        _login(client, child.username)
+        pages = client.get("/api/transactions").get_json()["pages"]
+        cursor = client.get("/api/transactions?cursor=").get_json()["next_cursor"]
+        child_endpoints = {
+            "GET /api/dashboard": "/api/dashboard",
+            "GET /api/dashboard?days=365": "/api/dashboard?days=365",
+            "GET /api/transactions (first page)": "/api/transactions",
+            "GET /api/transactions (middle page)": f"/api/transactions?page={pages // 2}",
+            "GET /api/transactions (last page)": f"/api/transactions?page={pages}",
+            "GET /api/transactions (cursor)": f"/api/transactions?cursor={cursor}",
+            "GET /api/transactions?type=interest": "/api/transactions?type=interest",
+        }
+        for name, url in child_endpoints.items():
+            results[name] = _timings(lambda: client.get(url), repeat)
+
+        _login(client, "suite-parent")
+        parent_endpoints = {
+            "GET /api/admin/users": "/api/admin/users",
+            "GET /api/admin/requests": "/api/admin/requests",
+            "GET /api/admin/requests?status=all": "/api/admin/requests?status=all",
+            "GET /api/admin/requests?status=all&limit=50": (
+                "/api/admin/requests?status=all&limit=50"
+            ),
+        }
+        for name, url in parent_endpoints.items():
+            results[name] = _timings(lambda: client.get(url), repeat)
+
+        middle = txns[len(txns) // 2].created_at
+        page = txns[len(txns) // 2 : len(txns) // 2 + 20]
+        fresh = iter(range(repeat))
+        results["get_balance (current)"] = _timings(lambda: get_balance(child), repeat)
+        results["get_balance (mid-history)"] = _timings(
+            lambda: get_balance(child, as_of=middle), repeat, setup=forget_balances
+        )
+        results["annotate_running_balance (20 rows)"] = _timings(
+            lambda: annotate_running_balance(child, page), repeat
+        )
+        results["run_catchup (fresh child)"] = _timings(
+            lambda: run_catchup(
+                _make_child(f"suite-fresh-{next(fresh)}", years, starting_balance=10)
+            ),
+            repeat,
+        )
+
+        report = {
+            "meta": {
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "children": children,
+                "years": years,
+                "events_per_month": events,
+                "repeat": repeat,
+                "seed": seed,
+                "transactions": db.session.execute(
+                    db.select(db.func.count()).select_from(Transaction)
+                ).scalar(),
+                "setup_seconds": round(setup_seconds, 3),
+            },
+            "results": {name: _summarize(samples) for name, samples in results.items()},
+        }
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = {}
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)["results"]
+
+    regressions = 0
+    for name, stats in report["results"].items():
+        line = f"{name:<48s} median={stats['median_ms']:9.3f}ms  p95={stats['p95_ms']:9.3f}ms"
+        if name in baseline and baseline[name]["median_ms"] > 0:
+            ratio = stats["median_ms"] / baseline[name]["median_ms"]
+            line += f"  {ratio:5.2f}x"
+            slower_ms = stats["median_ms"] - baseline[name]["median_ms"]
+            if ratio > threshold and slower_ms > REGRESSION_FLOOR_MS:
+                regressions += 1
+                line += "  REGRESSION"
+        click.echo(line)
+    click.echo(f"Wrote {output}")
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,16 +1,82 @@
-import calendar
+import threading
+import time
 from datetime import date, datetime, timedelta
 
-from flask import current_app
-
+from sqlalchemy.exc import IntegrityError
+
+from database import retry_on_locked
+from ledger import (
+    CREDIT_TYPES,
+    add_transaction,
+    balance_delta,
+    bulk_add_transactions,
+    forget_balances,
+    known_balances,
+    per_user_filters,
+    signed_amount,
+)
+from metrics import observe_catchup
 from models import Transaction, db
+from money import to_dollars
+from pagination import before
+from rollup import month_start, next_month, summary_before
+from schedule import build_schedule, current_rates, month_end_charge
+
+
+# Serializes catch-up per user within this process; the unique accrual index
+# on transactions covers concurrent workers.
+_user_locks = {}
+_user_locks_guard = threading.Lock()
+
+
+def _user_lock(user_id):
+    with _user_locks_guard:
+        return _user_locks.setdefault(user_id, threading.Lock())
+
 
+def run_catchup(user, bulk=True):
+    """Materialize any missing daily income and month-end interest transactions.
 
-def run_catchup(user):
-    """Materialize any missing daily income and month-end interest transactions."""
-    if user.monthly_allowance <= 0:
+    By default the whole run is computed in memory and written with a single
+    bulk insert. Pass ``bulk=False`` to use the original one-row-per-day path,
+    which flushes and queries the balance at every month end.
+
+    Safe to call concurrently: if another worker commits the same days
+    first, this run is rolled back and the other worker's rows are kept.
+
+    ``user.accrued_through`` records the last materialized day, so a user who
+    is already caught up costs no queries at all.
+    """
+    if user.monthly_allowance_cents <= 0:
+        return
+    if is_caught_up(user):
         return
 
+    with _user_lock(user.id):
+        started = time.perf_counter()
+        try:
+            written = _run_catchup(user, bulk)
+        except IntegrityError:
+            db.session.rollback()
+            forget_balances()
+            return
+        observe_catchup(
+            "bulk" if bulk else "per_day",
+            time.perf_counter() - started,
+            {user.id: written},
+        )
+
+
+def is_caught_up(user, today=None):
+    """Return True if the user's watermark says today is already accrued."""
+    today = today or date.today()
+    return user.accrued_through is not None and user.accrued_through >= today
+
+
+@retry_on_locked
+def _run_catchup(user, bulk):
+    """Catch up one user and commit; returns the types of the rows written."""
+    written = []
     last_income = db.session.execute(
         db.select(Transaction)
         .filter_by(user_id=user.id, type="income")
@@ -23,157 +89,373 @@ def run_catchup(user):
         start_date = user.allowance_start_date or user.created_at.date()
 
         # Insert starting balance adjustment on first catchup
-        if user.starting_balance != 0:
+        if user.starting_balance_cents != 0:
             existing_adj = db.session.execute(
                 db.select(Transaction).filter_by(
                     user_id=user.id, type="adjustment"
                 )
             ).scalars().first()
             if not existing_adj:
-                db.session.add(
-                    Transaction(
-                        user_id=user.id,
-                        type="adjustment",
-                        amount=round(user.starting_balance, 2),
-                        description="Starting balance",
-                        created_at=datetime(
-                            start_date.year, start_date.month, start_date.day
-                        )
-                        - timedelta(seconds=1),
-                    )
-                )
+                add_transaction(Transaction(**_starting_balance_row(user, start_date)))
+                written.append("adjustment")
 
     end_date = date.today()
 
     if start_date > end_date:
-        return
+        if last_income:
+            # Already current: record it so later calls skip the query
+            user.accrued_through = end_date
+            db.session.commit()
+        return written
+
+    if bulk:
+        rows = _catchup_bulk(user, start_date, end_date)
+        written.extend(row["type"] for row in rows)
+        user.accrued_through = end_date
+        db.session.commit()
+        return written
+
+    rates = current_rates()
+    schedule = build_schedule(user.monthly_allowance_cents, start_date, end_date)
+    for segment in schedule.months:
+        for day in segment.days:
+            txn = Transaction(
+                user_id=user.id,
+                type="income",
+                amount_cents=segment.daily,
+                description="Daily allowance",
+                created_at=day,
+            )
+            add_transaction(txn)
+            written.append("income")
+
+        if segment.closes:
+            db.session.flush()
+            interest = _apply_monthly_interest(user, segment.calendar, rates)
+            if interest:
+                written.append(interest["type"])
+
+    user.accrued_through = end_date
+    db.session.commit()
+    return written
+
+
+def _catchup_bulk(user, start_date, end_date):
+    """Compute daily income and month-end interest in memory, then bulk insert.
+
+    Produces the same rows as the per-day path: the balance at each month end
+    is derived from one opening balance plus the rows already in the ledger
+    and the rows generated so far in this run.
+    """
+    # Make a pending starting-balance adjustment visible to the queries below
+    db.session.flush()
+
+    first_month_start = datetime(start_date.year, start_date.month, 1)
+    opening = get_balance(user, as_of=first_month_start - timedelta(microseconds=1))
 
-    current = start_date
-    while current <= end_date:
-        days_in_month = calendar.monthrange(current.year, current.month)[1]
-        daily = round(user.monthly_allowance / days_in_month, 2)
-
-        txn = Transaction(
-            user_id=user.id,
-            type="income",
-            amount=daily,
-            description="Daily allowance",
-            created_at=datetime(current.year, current.month, current.day),
+    existing = db.session.execute(
+        db.select(Transaction.type, Transaction.amount_cents, Transaction.created_at)
+        .filter(
+            Transaction.user_id == user.id,
+            Transaction.created_at >= first_month_start,
         )
-        db.session.add(txn)
+        .order_by(Transaction.created_at, Transaction.id)
+    ).all()
 
-        if current.day == days_in_month:
-            db.session.flush()
-            _apply_monthly_interest(user, current)
+    rows = _accrual_rows(user, start_date, end_date, opening, existing)
+    bulk_add_transactions(rows)
+    return rows
+
+
+def run_catchup_many(users):
+    """Catch up many users at once with a fixed number of queries.
 
-        current += timedelta(days=1)
+    Equivalent to calling run_catchup() for each user, but the ledger lookups
+    are grouped across users and every new row is written in one bulk insert.
+    """
+    today = date.today()
+    pending = [
+        user
+        for user in users
+        if user.monthly_allowance_cents > 0 and not is_caught_up(user, today)
+    ]
+    if not pending:
+        return
+
+    started = time.perf_counter()
+    try:
+        written = _run_catchup_many(pending, today)
+    except IntegrityError:
+        # Another worker accrued some of these users first; theirs wins
+        db.session.rollback()
+        forget_balances()
+        return
+    observe_catchup("many", time.perf_counter() - started, written)
+
+
+@retry_on_locked
+def _run_catchup_many(users, today):
+    ids = [user.id for user in users]
+    last_income = dict(
+        db.session.execute(
+            db.select(Transaction.user_id, db.func.max(Transaction.created_at))
+            .filter(Transaction.user_id.in_(ids), Transaction.type == "income")
+            .group_by(Transaction.user_id)
+        ).all()
+    )
+    with_adjustment = set(
+        db.session.execute(
+            db.select(Transaction.user_id)
+            .filter(Transaction.user_id.in_(ids), Transaction.type == "adjustment")
+            .distinct()
+        ).scalars()
+    )
+
+    start_dates = {}
+    adjustments = []
+    for user in users:
+        if user.id in last_income:
+            start_date = last_income[user.id].date() + timedelta(days=1)
+        else:
+            start_date = user.allowance_start_date or user.created_at.date()
+            if user.starting_balance_cents != 0 and user.id not in with_adjustment:
+                adjustments.append(_starting_balance_row(user, start_date))
+
+        if start_date <= today:
+            start_dates[user.id] = start_date
+        elif user.id in last_income:
+            user.accrued_through = today
+
+    if not start_dates:
+        db.session.commit()
+        return {}
+
+    # Starting-balance rows must be in place before balances are read
+    bulk_add_transactions(adjustments)
+
+    first_month_starts = {
+        user_id: datetime(start_date.year, start_date.month, 1)
+        for user_id, start_date in start_dates.items()
+    }
+    openings = {}
+    for before_start in per_user_filters(
+        first_month_starts,
+        lambda user_id, start: db.and_(
+            Transaction.user_id == user_id, Transaction.created_at < start
+        ),
+    ):
+        openings.update(
+            db.session.execute(
+                db.select(Transaction.user_id, db.func.sum(signed_amount()))
+                .filter(before_start)
+                .group_by(Transaction.user_id)
+            ).all()
+        )
+    existing = {user_id: [] for user_id in start_dates}
+    for from_start in per_user_filters(
+        first_month_starts,
+        lambda user_id, start: db.and_(
+            Transaction.user_id == user_id, Transaction.created_at >= start
+        ),
+    ):
+        for row in db.session.execute(
+            db.select(
+                Transaction.user_id,
+                Transaction.type,
+                Transaction.amount_cents,
+                Transaction.created_at,
+            )
+            .filter(from_start)
+            .order_by(Transaction.user_id, Transaction.created_at, Transaction.id)
+        ):
+            existing[row.user_id].append(row)
+
+    rows = []
+    for user in users:
+        if user.id not in start_dates:
+            continue
+        rows.extend(
+            _accrual_rows(
+                user,
+                start_dates[user.id],
+                today,
+                openings.get(user.id, 0),
+                existing[user.id],
+            )
+        )
+        user.accrued_through = today
 
+    bulk_add_transactions(rows)
     db.session.commit()
 
+    written = {}
+    for row in adjustments + rows:
+        written.setdefault(row["user_id"], []).append(row["type"])
+    return written
+
+
+def _starting_balance_row(user, start_date):
+    """Return the backdated adjustment row holding a user's starting balance."""
+    return {
+        "user_id": user.id,
+        "type": "adjustment",
+        "amount_cents": user.starting_balance_cents,
+        "description": "Starting balance",
+        "created_at": datetime(start_date.year, start_date.month, start_date.day)
+        - timedelta(seconds=1),
+    }
 
-def _apply_monthly_interest(user, month_end_date):
-    """Apply savings interest or penalty interest for a completed month."""
-    month_start = month_end_date.replace(day=1)
+
+def _accrual_rows(user, start_date, end_date, opening, existing):
+    """Plan daily income and month-end interest rows for one user.
+
+    ``opening`` is the balance (cents) before the first month of the run and
+    ``existing`` the user's rows from that month on, in ledger order.
+    """
+    running = opening
+    months_with_interest = {
+        (row.created_at.year, row.created_at.month)
+        for row in existing
+        if row.type in ("interest", "penalty")
+    }
+    pending = 0
+    rates = current_rates()
+
+    rows = []
+    schedule = build_schedule(user.monthly_allowance_cents, start_date, end_date)
+    for segment in schedule.months:
+        for day in segment.days:
+            rows.append(
+                {
+                    "user_id": user.id,
+                    "type": "income",
+                    "amount_cents": segment.daily,
+                    "description": "Daily allowance",
+                    "created_at": day,
+                }
+            )
+        running += segment.daily * len(segment.days)
+
+        if segment.closes:
+            month = segment.calendar
+            cutoff = month.balance_cutoff
+            while pending < len(existing) and existing[pending].created_at <= cutoff:
+                row = existing[pending]
+                if row.type in CREDIT_TYPES:
+                    running += row.amount_cents
+                else:
+                    running -= row.amount_cents
+                pending += 1
+
+            if (month.year, month.month) not in months_with_interest:
+                txn = _monthly_interest_row(user, month, running, rates)
+                if txn:
+                    rows.append(txn)
+                    if txn["type"] == "interest":
+                        running += txn["amount_cents"]
+                    else:
+                        running -= txn["amount_cents"]
+
+    return rows
+
+
+def _monthly_interest_row(user, month, balance, rates):
+    """Return the interest or penalty row for a month-end balance (cents), if any.
+
+    ``month`` is a schedule.MonthCalendar and ``rates`` a monthly_rates() pair.
+    """
+    charge = month_end_charge(balance, rates)
+    if charge is None:
+        return None
+    txn_type, amount = charge
+    label = "Savings interest" if txn_type == "interest" else "Interest charge"
+    return {
+        "user_id": user.id,
+        "type": txn_type,
+        "amount_cents": amount,
+        "description": f"{label} for {month.name}",
+        "created_at": month.interest_at,
+    }
+
+
+def _apply_monthly_interest(user, month, rates):
+    """Apply savings interest or penalty interest for a completed month.
+
+    Returns the row written, if any.
+    """
     existing = db.session.execute(
         db.select(Transaction)
         .filter_by(user_id=user.id)
         .filter(Transaction.type.in_(["interest", "penalty"]))
-        .filter(
-            Transaction.created_at
-            >= datetime(month_start.year, month_start.month, month_start.day)
-        )
-        .filter(
-            Transaction.created_at
-            <= datetime(
-                month_end_date.year, month_end_date.month, month_end_date.day, 23, 59, 59
-            )
-        )
+        .filter(Transaction.created_at >= month.days[0])
+        .filter(Transaction.created_at <= month.interest_at)
     ).scalars().first()
     if existing:
         return
 
-    balance = get_balance(
-        user,
-        as_of=datetime(
-            month_end_date.year, month_end_date.month, month_end_date.day, 23, 59, 58
-        ),
-    )
+    balance = get_balance(user, as_of=month.balance_cutoff)
 
-    month_name = month_end_date.strftime("%B %Y")
-
-    if balance > 0:
-        apy = current_app.config["SAVINGS_INTEREST_RATE"]
-        monthly_rate = (1 + apy) ** (1 / 12) - 1
-        interest = round(balance * monthly_rate, 2)
-        if interest > 0:
-            db.session.add(
-                Transaction(
-                    user_id=user.id,
-                    type="interest",
-                    amount=interest,
-                    description=f"Savings interest for {month_name}",
-                    created_at=datetime(
-                        month_end_date.year,
-                        month_end_date.month,
-                        month_end_date.day,
-                        23,
-                        59,
-                        59,
-                    ),
-                )
-            )
-    elif balance < 0:
-        apr = current_app.config["CREDIT_INTEREST_RATE"]
-        monthly_rate = apr / 12
-        penalty = round(abs(balance) * monthly_rate, 2)
-        if penalty > 0:
-            db.session.add(
-                Transaction(
-                    user_id=user.id,
-                    type="penalty",
-                    amount=penalty,
-                    description=f"Interest charge for {month_name}",
-                    created_at=datetime(
-                        month_end_date.year,
-                        month_end_date.month,
-                        month_end_date.day,
-                        23,
-                        59,
-                        59,
-                    ),
-                )
-            )
+    txn = _monthly_interest_row(user, month, balance, rates)
+    if txn:
+        add_transaction(Transaction(**txn))
+    return txn
 
 
 def get_balance(user, as_of=None):
-    """Calculate user's balance from transaction history."""
-    filters = [Transaction.user_id == user.id]
-    if as_of:
-        filters.append(Transaction.created_at <= as_of)
-
-    credits = db.session.execute(
-        db.select(db.func.coalesce(db.func.sum(Transaction.amount), 0))
-        .filter(*filters)
-        .filter(Transaction.type.in_(["income", "interest", "adjustment"]))
-    ).scalar()
+    """Return user's balance in cents, optionally as of a point in time.
 
-    debits = db.session.execute(
-        db.select(db.func.coalesce(db.func.sum(Transaction.amount), 0))
-        .filter(*filters)
-        .filter(Transaction.type.in_(["withdrawal", "penalty"]))
-    ).scalar()
+    The current balance is read from the stored running total; historical
+    balances start from the latest closed monthly summary and add the
+    transactions after it. Historical balances are memoized for the rest of
+    the request, and a later lookup only sums the rows since the nearest
+    earlier one.
+    """
+    if as_of is None:
+        return user.balance_cents
+
+    known = known_balances(user.id)
+    if as_of not in known:
+        anchor = max((point for point in known if point < as_of), default=None)
+        known[as_of] = _sum_after_summary(
+            user,
+            as_of,
+            Transaction.created_at <= as_of,
+            (anchor, known[anchor]) if anchor else None,
+        )
+    return known[as_of]
 
-    return round(credits - debits, 2)
 
+def _sum_after_summary(user, moment, condition, anchor=None):
+    """Sum (in cents) the user's transactions matching ``condition``.
 
-CREDIT_TYPES = ("income", "interest", "adjustment")
-DEBIT_TYPES = ("withdrawal", "penalty")
+    ``condition`` must exclude everything after ``moment``; months that closed
+    before ``moment`` are read from their summary instead of the raw rows.
+    ``anchor`` is an optional known (as_of, balance_cents) before ``moment``,
+    used instead of the summary when it is more recent.
+    """
+    opening = 0
+    start = None
+    if anchor is None or anchor[0] < month_start(moment):
+        summary = summary_before(user.id, moment)
+        if summary:
+            opening = summary.closing_cents
+            start = month_start(next_month(summary.month))
+
+    query = db.select(db.func.coalesce(db.func.sum(signed_amount()), 0)).filter(
+        Transaction.user_id == user.id, condition
+    )
+    if anchor and (start is None or anchor[0] >= start):
+        opening = anchor[1]
+        query = query.filter(Transaction.created_at > anchor[0])
+    elif start:
+        query = query.filter(Transaction.created_at >= start)
+    return opening + db.session.execute(query).scalar()
 
 
 def txn_with_balance(txn, balance_after):
-    """Return a transaction dict with balance_after included."""
+    """Return a transaction dict with balance_after (given in cents) included."""
     d = txn.to_dict()
-    d["balance_after"] = balance_after
+    d["balance_after"] = to_dollars(balance_after)
     return d
 
 
@@ -194,39 +476,74 @@ def annotate_running_balance(user, transactions):
     result = []
     running = balance_before
     for txn in transactions:
-        if txn.type in CREDIT_TYPES:
-            running += txn.amount
-        else:
-            running -= txn.amount
-        result.append(txn_with_balance(txn, round(running, 2)))
+        running += balance_delta(txn.type, txn.amount_cents)
+        result.append(txn_with_balance(txn, running))
     return result
 
 
 def _balance_before(user, txn):
-    """Calculate balance just before a given transaction."""
-    # Query 1: strictly earlier timestamp
-    q1 = db.select(db.func.coalesce(db.func.sum(Transaction.amount), 0)).filter(
-        Transaction.user_id == user.id,
-        Transaction.created_at < txn.created_at,
-    )
+    """Calculate balance (cents) just before a given transaction."""
+    return balance_before_position(user, txn.created_at, txn.id)
+
+
+def balance_before_position(user, created_at, txn_id):
+    """Return the balance (cents) over the rows before a (created_at, id) position."""
+    return _sum_after_summary(user, created_at, before(Transaction, created_at, txn_id))
 
-    # Query 2: same timestamp, earlier ID
-    q2 = db.select(db.func.coalesce(db.func.sum(Transaction.amount), 0)).filter(
-        Transaction.user_id == user.id,
-        Transaction.created_at == txn.created_at,
-        Transaction.id < txn.id,
+
+def _precedes(earlier, txn):
+    """SQL condition: ``earlier`` sorts before ``txn`` in (created_at, id) order."""
+    return db.or_(
+        earlier.created_at < txn.created_at,
+        db.and_(earlier.created_at == txn.created_at, earlier.id < txn.id),
     )
 
-    credits = 0.0
-    debits = 0.0
 
-    for base_q in (q1, q2):
-        credits += db.session.execute(
-            base_q.filter(Transaction.type.in_(CREDIT_TYPES))
-        ).scalar()
-        debits += db.session.execute(
-            base_q.filter(Transaction.type.in_(DEBIT_TYPES))
-        ).scalar()
+def transactions_with_balance(user, txn_type=None, after=None):
+    """Select (Transaction, balance_after) rows for a user, newest first.
+
+    balance_after is the running balance over the user's whole ledger in
+    (created_at, id) order, computed in the same statement. It stays correct
+    when the rows are filtered by ``txn_type``. ``after`` is an optional
+    (created_at, id) keyset position; only older rows are returned.
+    """
+    if _window_functions_supported():
+        running = db.func.sum(signed_amount()).over(
+            order_by=(Transaction.created_at, Transaction.id)
+        )
+        ledger = (
+            db.select(Transaction, running.label("balance_after"))
+            .filter(Transaction.user_id == user.id)
+            .subquery()
+        )
+        txn = db.aliased(Transaction, ledger)
+        stmt = db.select(txn, ledger.c.balance_after)
+    else:
+        # SQLite before 3.25 has no window functions: sum with a correlated
+        # subquery per returned row instead
+        earlier = db.aliased(Transaction)
+        running = (
+            db.select(db.func.sum(signed_amount(earlier)))
+            .filter(
+                earlier.user_id == Transaction.user_id,
+                db.or_(_precedes(earlier, Transaction), earlier.id == Transaction.id),
+            )
+            .scalar_subquery()
+        )
+        txn = Transaction
+        stmt = db.select(Transaction, running.label("balance_after")).filter(
+            Transaction.user_id == user.id
+        )
+
+    if txn_type:
+        stmt = stmt.filter(txn.type == txn_type)
+    if after:
+        stmt = stmt.filter(before(txn, *after))
+    return stmt.order_by(txn.created_at.desc(), txn.id.desc())
 
-    return round(credits - debits, 2)
 
+def _window_functions_supported():
+    dialect = db.engine.dialect
+    if dialect.name == "sqlite":
+        return dialect.dbapi.sqlite_version_info >= (3, 25, 0)
+    return True
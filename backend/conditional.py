@@ -0,0 +1,78 @@
+"""Conditional GETs for views of the current user's ledger.
+
+Views wrapped in ledger_conditional() send an ``ETag`` and ``Last-Modified``
+built from the user's ledger_version and ledger_updated_at, which every
+transaction and withdrawal request write bumps. A request whose validators
+still match is answered ``304 Not Modified`` before the view runs, at the cost
+of the one query that loads the user's ledger columns. The day is part of the
+ETag and nothing is answered early while catch-up has days left to write, so
+the midnight rollover always produces a fresh response.
+"""
+
+from datetime import date, datetime, time, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_login import current_user
+
+from catchup import is_caught_up
+
+
+def _validators(user):
+    """Return (etag, last_modified) for the user's ledger views right now."""
+    today = date.today()
+    # Catch-up rolls over at local midnight, the dashboard chart at UTC midnight
+    utc_today = datetime.now(timezone.utc).date()
+    etag = f"{user.id}-{user.ledger_version}-{today:%Y%m%d}-{utc_today:%Y%m%d}"
+
+    day_started = max(
+        datetime.combine(today, time.min).astimezone(timezone.utc),
+        datetime.combine(utc_today, time.min, tzinfo=timezone.utc),
+    )
+    if user.ledger_updated_at is None:
+        return etag, day_started
+    return etag, max(user.ledger_updated_at.replace(tzinfo=timezone.utc), day_started)
+
+
+def _not_modified(etag, last_modified):
+    # If-Modified-Since only counts when the client sent no ETag
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    # Browsers may keep the response but must revalidate it every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def ledger_conditional(view):
+    """Answer GETs of a current-user ledger view with 304 when unchanged.
+
+    Must be applied inside login_required.
+    """
+
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        user = current_user
+        pending_catchup = user.monthly_allowance_cents > 0 and not is_caught_up(user)
+        if not pending_catchup:
+            etag, last_modified = _validators(user)
+            if _not_modified(etag, last_modified):
+                return _set_validators(
+                    current_app.response_class(status=304), etag, last_modified
+                )
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+        # Catch-up in the view may have moved the ledger on
+        return _set_validators(response, *_validators(user))
+
+    return decorated
@@ -1,4 +1,19 @@
 import os
+import tempfile
+
+# In-memory SQLite gets a single shared connection, which takes no pool sizes
+IN_MEMORY_URLS = ("sqlite://", "sqlite:///:memory:")
+
+
+def _pool_options(database_url):
+    if database_url in IN_MEMORY_URLS:
+        return {}
+    # Keep at least one pooled connection per gunicorn thread
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "8")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "8")),
+        "pool_timeout": 30,
+    }
 
 
 class Config:
@@ -7,14 +22,70 @@ class Config:
         "DATABASE_URL", "sqlite:///allowance.db"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _pool_options(SQLALCHEMY_DATABASE_URI)
+    # How long a SQLite connection waits for the write lock
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # Per-request SQL counts and timings (Server-Timing, /api/admin/metrics)
+    SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+    # Prometheus metrics at /metrics, which has no authentication: keep it off
+    # the public port. With several gunicorn workers, point METRICS_DIR at a
+    # directory they share so the totals cover all of them.
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    METRICS_DIR = os.environ.get("METRICS_DIR", "")
+    METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+
+    # werkzeug hash method and cost for new passwords, e.g. "scrypt:16384:8:1"
+    # or "pbkdf2:sha256:600000". Older hashes are upgraded on the next login.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # How long an authenticated user's identity is cached between requests
+    # (0 disables the cache)
+    LOGIN_CACHE_SECONDS = float(os.environ.get("LOGIN_CACHE_SECONDS", "60"))
 
     # Interest rates (annualized)
     SAVINGS_INTEREST_RATE = float(os.environ.get("SAVINGS_INTEREST_RATE", "0.05"))
     CREDIT_INTEREST_RATE = float(os.environ.get("CREDIT_INTEREST_RATE", "0.24"))
 
+    # Scheduled accrual (alternative: run `flask accrue` from cron)
+    ACCRUAL_SCHEDULER = os.environ.get("ACCRUAL_SCHEDULER", "").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    ACCRUAL_TIME = os.environ.get("ACCRUAL_TIME", "00:05")
+    # Whichever process holds a lock on this file runs the background jobs
+    # (see jobs.py); put it on a shared volume to cover several containers
+    JOBS_LOCK_FILE = os.environ.get(
+        "JOBS_LOCK_FILE", os.path.join(tempfile.gettempdir(), "allowance-jobs.lock")
+    )
+
     # ntfy
     NTFY_SERVER = os.environ.get("NTFY_SERVER", "")
     NTFY_TOPIC = os.environ.get("NTFY_TOPIC", "allowance")
+    # Seconds to wait for a burst of notifications before sending one push
+    NTFY_BATCH_SECONDS = float(os.environ.get("NTFY_BATCH_SECONDS", "2"))
+    # Failed sends are retried after NTFY_RETRY_SECONDS, doubling each attempt
+    NTFY_RETRY_SECONDS = float(os.environ.get("NTFY_RETRY_SECONDS", "5"))
+    NTFY_MAX_ATTEMPTS = int(os.environ.get("NTFY_MAX_ATTEMPTS", "10"))
+
+    # Live withdrawal request events (/api/admin/requests/stream). Under
+    # gthread workers each open stream holds a thread, so streams are limited
+    # per worker (raise the limit with gevent workers) and ended after
+    # EVENTS_STREAM_SECONDS; browsers reconnect and resume.
+    EVENTS_MAX_STREAMS = int(os.environ.get("EVENTS_MAX_STREAMS", "2"))
+    EVENTS_STREAM_SECONDS = float(os.environ.get("EVENTS_STREAM_SECONDS", "300"))
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+    # How often a worker with open streams looks for other workers' events
+    EVENTS_POLL_SECONDS = float(os.environ.get("EVENTS_POLL_SECONDS", "1"))
 
     # Static files (frontend build output)
     STATIC_FOLDER = os.environ.get("STATIC_FOLDER", "../frontend/build")
@@ -1,82 +1,109 @@
 from datetime import datetime, timedelta, timezone
 
-from flask import Blueprint
+from flask import Blueprint, request
 from flask_login import current_user, login_required
 
-from catchup import annotate_running_balance, get_balance, run_catchup
+from catchup import get_balance, run_catchup, transactions_with_balance, txn_with_balance
+from conditional import ledger_conditional
+from ledger import signed_amount
 from models import Transaction, db
+from money import to_dollars
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
+CHART_WINDOWS = (30, 90, 365)
+DEFAULT_CHART_WINDOW = 90
+
+# user_id -> ((ledger_version, today), (opening_cents, [(day, delta_cents), ...]))
+# Daily deltas cover the largest window; smaller windows are sliced from it.
+_chart_cache = {}
+
 
 @dashboard_bp.route("/api/dashboard")
 @login_required
+@ledger_conditional
 def dashboard():
+    days = request.args.get("days", DEFAULT_CHART_WINDOW, type=int)
+    if days not in CHART_WINDOWS:
+        return {
+            "error": f"days must be one of {', '.join(map(str, CHART_WINDOWS))}"
+        }, 400
+
     run_catchup(current_user)
 
     balance = get_balance(current_user)
 
     recent = db.session.execute(
-        db.select(Transaction)
-        .filter_by(user_id=current_user.id)
-        .order_by(Transaction.created_at.desc())
-        .limit(10)
-    ).scalars().all()
-
-    # Chart data: daily balance for the last 90 days
-    ninety_days_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=90)
-    all_txns = db.session.execute(
-        db.select(Transaction)
-        .filter_by(user_id=current_user.id)
-        .order_by(Transaction.created_at.asc())
-    ).scalars().all()
-
-    # Build running balance series
-    labels = []
-    balances = []
-    running = 0.0
-
-    start_date_str = ninety_days_ago.strftime("%Y-%m-%d")
-    start_point_added = False
-
-    for txn in all_txns:
-        delta = 0
-        if txn.type in ("income", "interest", "adjustment"):
-            delta = txn.amount
-        else:
-            delta = -txn.amount
+        transactions_with_balance(current_user).limit(10)
+    ).all()
 
-        if txn.created_at < ninety_days_ago:
-            running += delta
-        else:
-            if not start_point_added:
-                labels.append(start_date_str)
-                balances.append(round(running, 2))
-                start_point_added = True
+    return {
+        "balance": to_dollars(balance),
+        "recent_transactions": [
+            txn_with_balance(txn, balance_after)
+            for txn, balance_after in recent
+        ],
+        "chart_data": balance_chart(current_user, days),
+    }
 
-            running += delta
 
-            day_label = txn.created_at.strftime("%Y-%m-%d")
-            # Collapse multiple transactions on the same day to the last one
-            if labels and labels[-1] == day_label:
-                balances[-1] = round(running, 2)
-            else:
-                labels.append(day_label)
-                balances.append(round(running, 2))
+def balance_chart(user, days):
+    """Return daily end-of-day balances for the last ``days`` days."""
+    today = datetime.now(timezone.utc).date()
+    window_start = today - timedelta(days=days)
+
+    running, daily_deltas = _daily_deltas(user, today)
+    start_label = window_start.isoformat()
 
-    if not start_point_added:
-        labels.append(start_date_str)
-        balances.append(round(running, 2))
+    labels = [start_label]
+    balances = [running]
+    for day, delta in daily_deltas:
+        if day < start_label:
+            running += delta
+            balances[0] = running
+            continue
 
-    today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    if labels and labels[-1] != today_str:
+        running += delta
+        # Rows on the window's first day collapse into the start point
+        if labels[-1] == day:
+            balances[-1] = running
+        else:
+            labels.append(day)
+            balances.append(running)
+
+    today_str = today.isoformat()
+    if labels[-1] != today_str:
         labels.append(today_str)
         balances.append(balances[-1])
 
-    return {
-        "balance": balance,
-        "recent_transactions": annotate_running_balance(
-            current_user, list(reversed(recent))
-        )[::-1],
-        "chart_data": {"labels": labels, "balances": balances},
-    }
+    return {"labels": labels, "balances": [to_dollars(b) for b in balances]}
+
+
+def _daily_deltas(user, today):
+    """Return (balance before the largest window, per-day balance changes).
+
+    Cached per user until a transaction is written or the day rolls over.
+    """
+    key = (user.ledger_version, today)
+    cached = _chart_cache.get(user.id)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    window_start = today - timedelta(days=max(CHART_WINDOWS))
+    window_start_dt = datetime(window_start.year, window_start.month, window_start.day)
+
+    opening = get_balance(user, as_of=window_start_dt - timedelta(microseconds=1))
+    day = db.func.date(Transaction.created_at)
+    daily_deltas = db.session.execute(
+        db.select(day, db.func.sum(signed_amount()))
+        .filter(
+            Transaction.user_id == user.id,
+            Transaction.created_at >= window_start_dt,
+        )
+        .group_by(day)
+        .order_by(day)
+    ).all()
+
+    result = (opening, [(d, delta) for d, delta in daily_deltas])
+    _chart_cache[user.id] = (key, result)
+    return result
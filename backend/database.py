@@ -0,0 +1,63 @@
+"""SQLite connection tuning and retries for concurrent workers.
+
+With several gunicorn workers or threads sharing one SQLite file, every
+connection runs in WAL mode (readers never block the writer) and waits up to
+SQLITE_BUSY_TIMEOUT_MS for the write lock. A write that still fails with
+"database is locked", typically a read transaction that could not be upgraded
+after another writer committed, is rolled back and retried by
+retry_on_locked().
+"""
+
+import time
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from ledger import forget_balances
+from models import db
+
+LOCKED_ATTEMPTS = 5
+LOCKED_BACKOFF_SECONDS = 0.05
+
+
+def configure_sqlite(app):
+    """Apply WAL, busy timeout and synchronous=NORMAL to every new connection."""
+    if db.engine.dialect.name != "sqlite":
+        return
+    busy_timeout = app.config["SQLITE_BUSY_TIMEOUT_MS"]
+
+    @event.listens_for(db.engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+        if db.engine.url.database not in (None, "", ":memory:"):
+            cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and "database is locked" in str(exc.orig)
+
+
+def retry_on_locked(f):
+    """Retry a write path that hit "database is locked", with backoff.
+
+    The session is rolled back before each retry, so ``f`` must be safe to
+    run again from the start (request handlers and catch-up are).
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        for attempt in range(1, LOCKED_ATTEMPTS + 1):
+            try:
+                return f(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt == LOCKED_ATTEMPTS or not is_locked_error(exc):
+                    raise
+                db.session.rollback()
+                forget_balances()
+                time.sleep(LOCKED_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+    return decorated
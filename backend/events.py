@@ -0,0 +1,290 @@
+"""Live withdrawal request events for parents, as server-sent events.
+
+publish_request_event() adds a row to ``request_events`` in the caller's
+database transaction, so an event exists exactly when its change is committed
+and its id orders events across every gunicorn worker. In each process one
+listener thread reads new rows into an in-memory buffer: right after a local
+commit that published one, and every EVENTS_POLL_SECONDS for other workers'
+events while a stream is open. Streams only wait on that buffer and never
+touch the database, so an idle client holds no connection and runs no
+queries. A reconnecting client sends ``Last-Event-ID`` and is sent everything
+after it, or a ``reset`` event if those events are gone.
+
+Each open stream still occupies a worker thread under gunicorn's gthread
+workers (a greenlet under gevent), so streams are limited to
+EVENTS_MAX_STREAMS per process and ended after EVENTS_STREAM_SECONDS;
+browsers reconnect on their own and resume. A stream over the limit is
+closed straight away with a longer retry delay.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from flask import Response, current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import RequestEvent, db
+
+# Events kept in memory for resuming streams
+BUFFER_SIZE = 1000
+# Events older than this are deleted by the listener
+KEEP_DAYS = 7
+PRUNE_SECONDS = 3600
+# Reconnect delay browsers are told to use
+RETRY_MS = 2000
+# Reconnect delay for a stream turned away because the worker is full
+BUSY_RETRY_MS = 15000
+
+_wake = threading.Event()
+_listener_lock = threading.Lock()
+_listener = None
+
+
+class StreamEvent(NamedTuple):
+    id: int
+    type: str
+    data: str
+
+    def encode(self):
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+
+RESET = "event: reset\ndata: {}\n\n"
+KEEP_ALIVE = ": keep-alive\n\n"
+
+
+class EventBuffer:
+    """The latest request events, shared by every stream in this process."""
+
+    def __init__(self, size=BUFFER_SIZE):
+        self._events = deque(maxlen=size)
+        self._loaded = False
+        self._last_id = 0
+        # Every event with an id above this is in the buffer
+        self._complete_after = 0
+        self._streams = 0
+        self._changed = threading.Condition()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    @property
+    def streams(self):
+        return self._streams
+
+    def load(self, events):
+        """Fill the buffer with the newest stored events, oldest first."""
+        with self._changed:
+            self._events.extend(events)
+            if events:
+                self._complete_after = events[0].id - 1
+                self._last_id = events[-1].id
+            self._loaded = True
+            self._changed.notify_all()
+
+    def extend(self, events):
+        if not events:
+            return
+        with self._changed:
+            for item in events:
+                if len(self._events) == self._events.maxlen:
+                    self._complete_after = self._events[0].id
+                self._events.append(item)
+            self._last_id = events[-1].id
+            self._changed.notify_all()
+
+    def wait_after(self, after_id, timeout):
+        """Return the events after ``after_id``, waiting up to ``timeout`` for one.
+
+        Returns None if some of them have already left the buffer.
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self._loaded and self._last_id > after_id, timeout
+            )
+            if after_id < self._complete_after:
+                return None
+            return [item for item in self._events if item.id > after_id]
+
+    def open_stream(self, limit):
+        with self._changed:
+            if self._streams >= limit:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._changed:
+            self._streams -= 1
+
+
+_buffer = EventBuffer()
+
+
+def publish_request_event(event_type, wr, child_name):
+    """Record a change to withdrawal request ``wr`` for parents' event streams.
+
+    The event is sent once the caller commits, and never if it rolls back.
+    """
+    # Assigns wr.id and created_at
+    db.session.flush()
+    data = {**wr.to_dict(), "child_name": child_name}
+    db.session.add(
+        RequestEvent(type=event_type, request_id=wr.id, data=json.dumps(data))
+    )
+    db.session.info["request_event_queued"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("request_event_queued", False):
+        _wake.set()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop("request_event_queued", None)
+
+
+def _to_stream_event(row):
+    return StreamEvent(row.id, row.type, row.data)
+
+
+def _read_latest():
+    rows = db.session.execute(
+        db.select(RequestEvent).order_by(RequestEvent.id.desc()).limit(BUFFER_SIZE)
+    ).scalars().all()
+    return [_to_stream_event(row) for row in reversed(rows)]
+
+
+def _read_after(after_id):
+    rows = db.session.execute(
+        db.select(RequestEvent)
+        .filter(RequestEvent.id > after_id)
+        .order_by(RequestEvent.id)
+    ).scalars().all()
+    return [_to_stream_event(row) for row in rows]
+
+
+def latest_event_id():
+    """Return the id of the newest stored event, or 0 if there are none."""
+    return db.session.execute(db.select(db.func.max(RequestEvent.id))).scalar() or 0
+
+
+def prune_events(now=None):
+    """Delete events older than KEEP_DAYS. Returns the number deleted."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=KEEP_DAYS)
+    result = db.session.execute(
+        db.delete(RequestEvent).where(RequestEvent.created_at < cutoff)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def _listen(app, buffer):
+    loaded = False
+    pruned_at = None
+    while True:
+        with app.app_context():
+            try:
+                if loaded:
+                    buffer.extend(_read_after(buffer.last_id))
+                else:
+                    buffer.load(_read_latest())
+                    loaded = True
+                if pruned_at is None or time.monotonic() - pruned_at > PRUNE_SECONDS:
+                    pruned_at = time.monotonic()
+                    prune_events()
+            except Exception:
+                app.logger.exception("Reading request events failed")
+            finally:
+                db.session.remove()
+        # With no streams open only a local commit (or a new stream) wakes us
+        _wake.wait(app.config["EVENTS_POLL_SECONDS"] if buffer.streams else None)
+        _wake.clear()
+
+
+def _ensure_listener(app):
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(
+                target=_listen, args=(app, _buffer), name="request-events", daemon=True
+            )
+            _listener.start()
+    # Catch up on other workers' events before the stream starts waiting
+    _wake.set()
+
+
+def _generate(after_id, reset, heartbeat_seconds, stream_seconds):
+    yield f"retry: {RETRY_MS}\n\n"
+    if reset:
+        yield RESET
+    deadline = time.monotonic() + stream_seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        events = _buffer.wait_after(after_id, min(heartbeat_seconds, remaining))
+        if events is None:
+            yield RESET
+            after_id = _buffer.last_id
+        elif events:
+            yield "".join(item.encode() for item in events)
+            after_id = events[-1].id
+        else:
+            # Comments keep proxies from closing an idle connection and let
+            # the server notice a client that went away
+            yield KEEP_ALIVE
+
+
+def event_stream():
+    """Return the text/event-stream response for the current request.
+
+    New connections start from the latest event; ``Last-Event-ID`` (or a
+    ``last_event_id`` query parameter, such as the one the request list
+    returns) resumes after an earlier one.
+    """
+    config = current_app.config
+    last_seen = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        after_id = int(last_seen) if last_seen else None
+    except ValueError:
+        return {"error": "Invalid Last-Event-ID"}, 400
+
+    latest = latest_event_id()
+    # An id from before the events were reset (or from another database)
+    reset = after_id is not None and after_id > latest
+    if after_id is None or reset:
+        after_id = latest
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if not _buffer.open_stream(config["EVENTS_MAX_STREAMS"]):
+        # EventSource gives up for good on any error status; a 200 that only
+        # sets the retry delay makes it back off and try again
+        return Response(
+            f"retry: {BUSY_RETRY_MS}\n\n", mimetype="text/event-stream", headers=headers
+        )
+    _ensure_listener(current_app._get_current_object())
+
+    # Not stream_with_context: the generator needs no request or session, so
+    # the database connection goes back to the pool before the first event
+    response = Response(
+        _generate(
+            after_id,
+            reset,
+            config["EVENTS_HEARTBEAT_SECONDS"],
+            config["EVENTS_STREAM_SECONDS"],
+        ),
+        mimetype="text/event-stream",
+        headers=headers,
+    )
+    # Runs when the server closes the response, even if it was never read
+    response.call_on_close(_buffer.close_stream)
+    return response
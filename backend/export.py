@@ -0,0 +1,187 @@
+"""Streaming transaction exports as CSV or NDJSON.
+
+Rows are read from the ledger in batches and written out in chunks as they
+arrive, with the running balance carried along, so an export uses the same
+memory for ten years of daily income as for one month. Filters: ``from`` and
+``to`` (inclusive ISO dates), ``type`` and ``format`` (csv or ndjson).
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, Response, request, stream_with_context
+from flask_login import current_user, login_required
+
+from admin import admin_required
+from catchup import get_balance, run_catchup, run_catchup_many
+from ledger import balance_delta
+from models import Transaction, User, db
+from money import to_dollars
+
+export_bp = Blueprint("export", __name__)
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+COLUMNS = ("id", "user_id", "created_at", "type", "amount", "balance_after", "description")
+# Ledger rows fetched per database round trip
+FETCH_ROWS = 1000
+# Rows written per response chunk
+CHUNK_ROWS = 500
+
+
+@export_bp.route("/api/export")
+@login_required
+def export_own():
+    """Stream the current user's transactions, oldest first."""
+    try:
+        options = _parse_options(request.args)
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+
+    run_catchup(current_user)
+    return _stream([current_user], options, f"allowance-{current_user.username}")
+
+
+@export_bp.route("/api/admin/export")
+@admin_required
+def export_children():
+    """Stream every child's transactions, or one child's with ``user_id``."""
+    try:
+        options = _parse_options(request.args)
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+
+    stmt = db.select(User).filter_by(is_admin=False).order_by(User.id)
+    user_id = request.args.get("user_id", type=int)
+    if user_id is not None:
+        stmt = stmt.filter_by(id=user_id)
+    children = db.session.execute(stmt).scalars().all()
+    if user_id is not None and not children:
+        return {"error": "User not found"}, 404
+
+    run_catchup_many(children)
+    # Reload in one query; catch-up's commit expired the loaded rows
+    children = db.session.execute(stmt).scalars().all()
+    name = f"allowance-{children[0].username}" if user_id is not None else "allowance"
+    return _stream(children, options, name)
+
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} date: {value!r}") from None
+
+
+def _parse_options(args):
+    """Return (format, start, end, type) from the query string.
+
+    ``start`` and ``end`` are datetimes bounding the range, end exclusive.
+    Raises ValueError for an unknown format or a malformed date.
+    """
+    fmt = args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format: {fmt!r}")
+    first = _parse_date(args.get("from"), "from")
+    last = _parse_date(args.get("to"), "to")
+    start = datetime(first.year, first.month, first.day) if first else None
+    end = datetime(last.year, last.month, last.day) + timedelta(days=1) if last else None
+    return fmt, start, end, args.get("type") or None
+
+
+def ledger_rows(user, start=None, end=None):
+    """Yield (row, balance_after_cents) for a user's transactions in ledger order.
+
+    Rows are fetched FETCH_ROWS at a time; the running balance starts from
+    the balance just before ``start`` and is updated row by row.
+    """
+    stmt = (
+        db.select(
+            Transaction.id,
+            Transaction.user_id,
+            Transaction.type,
+            Transaction.amount_cents,
+            Transaction.description,
+            Transaction.created_at,
+        )
+        .filter(Transaction.user_id == user.id)
+        .order_by(Transaction.created_at, Transaction.id)
+        .execution_options(yield_per=FETCH_ROWS)
+    )
+    running = 0
+    if start:
+        stmt = stmt.filter(Transaction.created_at >= start)
+        running = get_balance(user, as_of=start - timedelta(microseconds=1))
+    if end:
+        stmt = stmt.filter(Transaction.created_at < end)
+
+    for row in db.session.execute(stmt):
+        running += balance_delta(row.type, row.amount_cents)
+        yield row, running
+
+
+def _csv_record(row, balance_after):
+    return (
+        row.id,
+        row.user_id,
+        row.created_at.isoformat(),
+        row.type,
+        f"{row.amount_cents / 100:.2f}",
+        f"{balance_after / 100:.2f}",
+        row.description,
+    )
+
+
+def _json_record(row, balance_after):
+    return json.dumps(
+        {
+            "id": row.id,
+            "user_id": row.user_id,
+            "created_at": row.created_at.isoformat(),
+            "type": row.type,
+            "amount": to_dollars(row.amount_cents),
+            "balance_after": to_dollars(balance_after),
+            "description": row.description,
+        }
+    ) + "\n"
+
+
+def _generate(users, fmt, start, end, txn_type):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(COLUMNS)
+
+    pending = 0
+    for user in users:
+        # Every row moves the balance, so rows of other types are read and
+        # skipped rather than filtered out in SQL
+        for row, balance_after in ledger_rows(user, start, end):
+            if txn_type and row.type != txn_type:
+                continue
+            if fmt == "csv":
+                writer.writerow(_csv_record(row, balance_after))
+            else:
+                buffer.write(_json_record(row, balance_after))
+            pending += 1
+            if pending == CHUNK_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _stream(users, options, name):
+    fmt, start, end, txn_type = options
+    # Stream as the rows are read; the request (and its session) stays open
+    # until the last chunk is sent
+    return Response(
+        stream_with_context(_generate(users, fmt, start, end, txn_type)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
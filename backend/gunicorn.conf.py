@@ -0,0 +1,9 @@
+"""gunicorn settings, read from the working directory when gunicorn starts."""
+
+
+def post_worker_init(worker):
+    # Runs in each worker after it has loaded the app; only the worker that
+    # gets the jobs lock starts them
+    from jobs import start_jobs
+
+    start_jobs(worker.wsgi)
@@ -0,0 +1,149 @@
+"""Opt-in per-request SQL instrumentation.
+
+With ``SQL_INSTRUMENTATION`` enabled, every request counts and times the SQL
+statements it runs. The totals go out in a ``Server-Timing`` response header
+and are aggregated per endpoint for ``/api/admin/metrics``. Aggregates are
+kept per process, so with several gunicorn workers each reports its own.
+
+query_budget() works whether or not instrumentation is enabled and is meant
+for checks that a route stays within a fixed number of queries.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from models import db
+
+# Longest statement text kept as an endpoint's slowest query
+STATEMENT_CHARS = 300
+
+_endpoint_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _statement_text(statement):
+    return " ".join(statement.split())[:STATEMENT_CHARS]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    if not has_request_context() or "sql_queries" not in g:
+        return
+    g.sql_queries += 1
+    g.sql_seconds += elapsed
+    if elapsed > g.sql_slowest[0]:
+        g.sql_slowest = (elapsed, statement)
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+    g.sql_slowest = (0.0, None)
+
+
+def _finish_request(response):
+    if "request_started" not in g:
+        return response
+    wall = time.perf_counter() - g.request_started
+    queries = f"{g.sql_queries} {'query' if g.sql_queries == 1 else 'queries'}"
+    response.headers["Server-Timing"] = (
+        f'db;dur={g.sql_seconds * 1000:.2f};desc="{queries}", '
+        f"app;dur={wall * 1000:.2f}"
+    )
+
+    endpoint = request.endpoint or "<unmatched>"
+    slowest_seconds, slowest_statement = g.sql_slowest
+    with _stats_lock:
+        stats = _endpoint_stats.setdefault(
+            endpoint,
+            {
+                "requests": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "db_ms": 0.0,
+                "wall_ms": 0.0,
+                "max_wall_ms": 0.0,
+                "slowest_query_ms": 0.0,
+                "slowest_query": None,
+            },
+        )
+        stats["requests"] += 1
+        stats["queries"] += g.sql_queries
+        stats["max_queries"] = max(stats["max_queries"], g.sql_queries)
+        stats["db_ms"] += g.sql_seconds * 1000
+        stats["wall_ms"] += wall * 1000
+        stats["max_wall_ms"] = max(stats["max_wall_ms"], wall * 1000)
+        if slowest_seconds * 1000 > stats["slowest_query_ms"]:
+            stats["slowest_query_ms"] = slowest_seconds * 1000
+            stats["slowest_query"] = _statement_text(slowest_statement)
+    return response
+
+
+def init_instrumentation(app):
+    """Hook SQL and request timing into the app if SQL_INSTRUMENTATION is set."""
+    if not app.config["SQL_INSTRUMENTATION"]:
+        return
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def endpoint_metrics():
+    """Return {endpoint: stats} for this process, with per-request averages."""
+    with _stats_lock:
+        snapshot = {endpoint: dict(stats) for endpoint, stats in _endpoint_stats.items()}
+    for stats in snapshot.values():
+        count = stats["requests"]
+        stats["avg_queries"] = round(stats["queries"] / count, 2)
+        stats["avg_db_ms"] = round(stats["db_ms"] / count, 3)
+        stats["avg_wall_ms"] = round(stats["wall_ms"] / count, 3)
+        for key in ("db_ms", "wall_ms", "max_wall_ms", "slowest_query_ms"):
+            stats[key] = round(stats[key], 3)
+    return snapshot
+
+
+def reset_metrics():
+    with _stats_lock:
+        _endpoint_stats.clear()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail with QueryBudgetExceeded if the block runs more than ``max_queries``.
+
+    Only statements run on the calling thread count, so background threads
+    such as the request event listener do not eat into the budget. Yields
+    the list of statements run so far, which callers may inspect.
+    """
+    statements = []
+    thread = threading.get_ident()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            statements.append(statement)
+
+    event.listen(db.engine, "after_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "after_cursor_execute", record)
+    if len(statements) > max_queries:
+        listing = "\n".join(f"  {_statement_text(s)}" for s in statements)
+        raise QueryBudgetExceeded(
+            f"{len(statements)} queries (budget {max_queries}):\n{listing}"
+        )
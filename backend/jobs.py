@@ -0,0 +1,65 @@
+"""Background jobs that run in exactly one process.
+
+The daily accrual scheduler (ACCRUAL_SCHEDULER) and the ntfy sender
+(NTFY_SERVER) must not run once per gunicorn worker, nor in ``flask``
+commands such as ``seed`` or ``accrue``.
+So the app factory starts no jobs; gunicorn.conf.py calls start_jobs() in
+each worker once it has loaded the app. Every worker tries for an exclusive
+lock on JOBS_LOCK_FILE: the one that gets it runs the jobs, and the others
+try again every RETRY_SECONDS so that one takes over if that worker exits.
+"""
+
+import fcntl
+import threading
+import time
+
+from accrual import start_scheduler
+from notifications import start_sender
+
+# How often a worker without the lock tries to take it over
+RETRY_SECONDS = 30
+
+# The lock file stays open, and so locked, for as long as this process runs
+_lock_file = None
+
+
+def _try_lock(path):
+    """Return the open, exclusively locked file at ``path``, or None if taken."""
+    handle = open(path, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+    return handle
+
+
+def _run_jobs(app):
+    app.logger.info("Running background jobs in this process")
+    if app.config["ACCRUAL_SCHEDULER"]:
+        start_scheduler(app)
+    if app.config["NTFY_SERVER"]:
+        start_sender(app)
+
+
+def _wait_for_lock(app, path):
+    global _lock_file
+    while _lock_file is None:
+        time.sleep(RETRY_SECONDS)
+        _lock_file = _try_lock(path)
+    _run_jobs(app)
+
+
+def start_jobs(app):
+    """Run the background jobs here if no other process holds the lock."""
+    global _lock_file
+    if not (app.config["ACCRUAL_SCHEDULER"] or app.config["NTFY_SERVER"]):
+        return
+    path = app.config["JOBS_LOCK_FILE"]
+    _lock_file = _try_lock(path)
+    if _lock_file is not None:
+        _run_jobs(app)
+        return
+    threading.Thread(
+        target=_wait_for_lock, args=(app, path), name="jobs-lock", daemon=True
+    ).start()
@@ -0,0 +1,211 @@
+from datetime import date, datetime
+
+import click
+from flask import g
+
+from models import MonthlySummary, Transaction, User, db
+from money import to_dollars
+
+CREDIT_TYPES = ("income", "interest", "adjustment")
+DEBIT_TYPES = ("withdrawal", "penalty")
+# SQLite parses an OR chain into a tree at most 1000 deep, so per-user
+# conditions are ORed together in groups of this many
+OR_TERMS = 400
+
+
+def signed_amount(txn=Transaction):
+    """SQL expression for the cents a transaction adds to the balance.
+
+    Pass an aliased Transaction to build the expression against the alias.
+    """
+    return db.case(
+        (txn.type.in_(CREDIT_TYPES), txn.amount_cents),
+        else_=-txn.amount_cents,
+    )
+
+
+def per_user_filters(values, term):
+    """Yield OR filters of ``term(user_id, value)`` over ``values``.
+
+    ``values`` maps user_id to that user's value; each filter covers at most
+    OR_TERMS users, so callers run one statement per filter.
+    """
+    items = list(values.items())
+    for i in range(0, len(items), OR_TERMS):
+        yield db.or_(*(term(user_id, value) for user_id, value in items[i : i + OR_TERMS]))
+
+
+def balance_delta(txn_type, amount_cents):
+    """Return how many cents a transaction of this type moves the balance."""
+    return amount_cents if txn_type in CREDIT_TYPES else -amount_cents
+
+
+def add_transaction(txn):
+    """Add a transaction and update the owner's stored balance and version.
+
+    Both changes land in the current database transaction, so they are
+    committed or rolled back together.
+    """
+    db.session.add(txn)
+    _apply_balance_delta(txn.user_id, balance_delta(txn.type, txn.amount_cents))
+    earliest = {txn.user_id: txn.created_at or datetime.utcnow()}
+    forget_balances(earliest)
+    _invalidate_summaries(earliest)
+
+
+def bulk_add_transactions(rows):
+    """Insert many transaction rows (dicts, any mix of users) in one statement."""
+    if not rows:
+        return
+    db.session.execute(db.insert(Transaction), rows)
+
+    deltas = {}
+    earliest = {}
+    for row in rows:
+        user_id = row["user_id"]
+        delta = balance_delta(row["type"], row["amount_cents"])
+        deltas[user_id] = deltas.get(user_id, 0) + delta
+        created_at = row.get("created_at") or datetime.utcnow()
+        earliest[user_id] = min(earliest.get(user_id, created_at), created_at)
+    _apply_balance_deltas(deltas)
+    forget_balances(earliest)
+    _invalidate_summaries(earliest)
+
+
+def _apply_balance_delta(user_id, delta):
+    _apply_balance_deltas({user_id: delta})
+
+
+def touch_ledger(user_id):
+    """Bump a user's ledger version for a write that moves no money.
+
+    Withdrawal requests use this so cached views of them are refreshed.
+    """
+    _apply_balance_delta(user_id, 0)
+
+
+def known_balances(user_id):
+    """Return the current request's memo of {as_of: balance_cents} for a user.
+
+    The memo lives on ``flask.g``, so it is dropped with the request (or app
+    context). Ledger writes forget the balances they change; callers that
+    roll back a write must call forget_balances() themselves.
+    """
+    return g.setdefault("balance_memo", {}).setdefault(user_id, {})
+
+
+def forget_balances(earliest=None):
+    """Drop memoized balances, by default all of them.
+
+    ``earliest`` maps user_id to the oldest created_at just written; only
+    that user's balances as of that moment or later are dropped.
+    """
+    if earliest is None:
+        g.pop("balance_memo", None)
+        return
+    memo = g.get("balance_memo", {})
+    for user_id, created_at in earliest.items():
+        known = memo.get(user_id, {})
+        for as_of in [as_of for as_of in known if as_of >= created_at]:
+            del known[as_of]
+
+
+def _apply_balance_deltas(deltas):
+    """Add {user_id: delta_cents} to stored balances in a single UPDATE.
+
+    Also bumps each user's ledger_version and ledger_updated_at.
+    """
+    # Increment in SQL so concurrent writers cannot lose an update
+    db.session.execute(
+        db.update(User)
+        .where(User.id.in_(deltas))
+        .values(
+            balance_cents=User.balance_cents + db.case(deltas, value=User.id, else_=0),
+            ledger_version=User.ledger_version + 1,
+            ledger_updated_at=datetime.utcnow(),
+        )
+    )
+
+
+def _invalidate_summaries(earliest):
+    """Drop monthly summaries a back-dated write has made stale.
+
+    ``earliest`` maps user_id to the oldest created_at just written. Writes
+    into the open month cannot touch a summary and issue no query.
+    """
+    open_month = date.today().replace(day=1)
+    stale = {
+        user_id: created_at.date().replace(day=1)
+        for user_id, created_at in earliest.items()
+        if created_at.date() < open_month
+    }
+    if not stale:
+        return
+    for stale_filter in per_user_filters(
+        stale,
+        lambda user_id, month: db.and_(
+            MonthlySummary.user_id == user_id, MonthlySummary.month >= month
+        ),
+    ):
+        db.session.execute(db.delete(MonthlySummary).where(stale_filter))
+
+
+def ledger_balances():
+    """Return {user_id: balance_cents} summed from the raw transaction ledger."""
+    rows = db.session.execute(
+        db.select(Transaction.user_id, db.func.sum(signed_amount())).group_by(
+            Transaction.user_id
+        )
+    ).all()
+    return dict(rows)
+
+
+def rebuild_balances():
+    """Recompute every user's stored balance from the ledger."""
+    total = (
+        db.select(db.func.coalesce(db.func.sum(signed_amount()), 0))
+        .where(Transaction.user_id == User.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(User).values(
+            balance_cents=total,
+            ledger_version=User.ledger_version + 1,
+            ledger_updated_at=datetime.utcnow(),
+        )
+    )
+    db.session.commit()
+
+
+def find_balance_mismatches():
+    """Return [(user, stored, ledger)] for users whose stored balance is off."""
+    ledger = ledger_balances()
+    mismatches = []
+    for user in db.session.execute(db.select(User)).scalars():
+        expected = ledger.get(user.id, 0)
+        if user.balance_cents != expected:
+            mismatches.append((user, user.balance_cents, expected))
+    return mismatches
+
+
+@click.command("rebuild-balances")
+@click.option(
+    "--check", is_flag=True, help="Only verify stored balances; exit 1 on mismatch"
+)
+def rebuild_balances_command(check):
+    """Rebuild stored user balances from the transaction ledger."""
+    mismatches = find_balance_mismatches()
+    for user, stored, expected in mismatches:
+        click.echo(
+            f"{user.username}: stored {to_dollars(stored):.2f}, "
+            f"ledger {to_dollars(expected):.2f}"
+        )
+
+    if check:
+        if mismatches:
+            raise SystemExit(1)
+        click.echo("All stored balances match the ledger.")
+        return
+
+    rebuild_balances()
+    click.echo(f"Rebuilt balances ({len(mismatches)} corrected).")
@@ -0,0 +1,249 @@
+"""In-process Prometheus metrics, served at ``/metrics`` in the text format.
+
+Counters and histograms are plain in-memory totals updated under a lock. With
+several gunicorn workers, set ``METRICS_DIR`` to a directory shared by them:
+each process then writes its totals to ``<dir>/<pid>.json`` every
+METRICS_FLUSH_SECONDS (and when scraped), and ``/metrics`` sums every file in
+the directory. Files of exited workers are kept so counters never go
+backwards; delete the ``*.json`` files when the server starts.
+
+``/metrics`` has no authentication, so it is off unless METRICS_ENABLED is
+set, and should only be reachable from the scraper.
+"""
+
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, request
+
+metrics_bp = Blueprint("metrics", __name__)
+
+_lock = threading.Lock()
+_metrics = []
+# {metric name: {label string: value}}; histogram values are
+# {"buckets": [count per bucket], "sum": float, "count": int}
+_values = {}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_string(labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items()))
+
+
+def _series(name, labels):
+    return f"{name}{{{labels}}}" if labels else name
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_string(labels)
+        with _lock:
+            series = _values.setdefault(self.name, {})
+            series[key] = series.get(key, 0) + amount
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_string(labels)
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound),
+            len(self.buckets),
+        )
+        with _lock:
+            series = _values.setdefault(self.name, {})
+            totals = series.get(key)
+            if totals is None:
+                totals = series[key] = {
+                    "buckets": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            totals["buckets"][index] += 1
+            totals["sum"] += value
+            totals["count"] += 1
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DAY_BUCKETS = (1, 2, 7, 31, 92, 366, 1830, 7320)
+
+REQUEST_SECONDS = Histogram(
+    "allowance_http_request_duration_seconds",
+    "HTTP request latency by blueprint, method and status.",
+    LATENCY_BUCKETS,
+)
+CATCHUP_SECONDS = Histogram(
+    "allowance_catchup_duration_seconds",
+    "Time spent in one catch-up run.",
+    LATENCY_BUCKETS,
+)
+CATCHUP_DAYS = Histogram(
+    "allowance_catchup_days",
+    "Days of income materialized per catch-up run and user.",
+    DAY_BUCKETS,
+)
+CATCHUP_ROWS = Histogram(
+    "allowance_catchup_rows",
+    "Transaction rows written per catch-up run and user.",
+    DAY_BUCKETS,
+)
+ACCRUED_TRANSACTIONS = Counter(
+    "allowance_accrued_transactions_total",
+    "Transactions written by catch-up, by type (income, interest, penalty, adjustment).",
+)
+WITHDRAWAL_RESOLUTION_SECONDS = Histogram(
+    "allowance_withdrawal_resolution_seconds",
+    "Time from a withdrawal request to its approval or denial.",
+    (60, 300, 900, 3600, 4 * 3600, 12 * 3600, 86400, 3 * 86400, 7 * 86400),
+)
+
+
+def observe_catchup(mode, seconds, rows_by_user):
+    """Record one catch-up run; ``rows_by_user`` maps user_id to written types."""
+    CATCHUP_SECONDS.observe(seconds, mode=mode)
+    for types in rows_by_user.values():
+        CATCHUP_DAYS.observe(types.count("income"), mode=mode)
+        CATCHUP_ROWS.observe(len(types), mode=mode)
+        for txn_type in set(types):
+            ACCRUED_TRANSACTIONS.inc(types.count(txn_type), type=txn_type)
+
+
+def _snapshot():
+    with _lock:
+        return json.loads(json.dumps(_values))
+
+
+def _merge(into, values):
+    for name, series in values.items():
+        target = into.setdefault(name, {})
+        for key, value in series.items():
+            if isinstance(value, dict):
+                totals = target.setdefault(
+                    key, {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0}
+                )
+                totals["buckets"] = [a + b for a, b in zip(totals["buckets"], value["buckets"])]
+                totals["sum"] += value["sum"]
+                totals["count"] += value["count"]
+            else:
+                target[key] = target.get(key, 0) + value
+
+
+def _flush(directory):
+    """Write this process's totals to its file in the shared directory."""
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(_snapshot(), f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _collect():
+    directory = current_app.config["METRICS_DIR"]
+    if not directory:
+        return _snapshot()
+    _flush(directory)
+    merged = {}
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(path) as f:
+                _merge(merged, json.load(f))
+        except (OSError, ValueError):
+            continue
+    return merged
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format."""
+    values = _collect()
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for key, value in sorted(values.get(metric.name, {}).items()):
+            if metric.type == "counter":
+                lines.append(f"{_series(metric.name, key)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            bounds = metric.buckets + (math.inf,)
+            for bound, count in zip(bounds, value["buckets"]):
+                cumulative += count
+                le = _label_string({"le": _format_value(float(bound))})
+                labels = f"{key},{le}" if key else le
+                lines.append(f"{metric.name}_bucket{{{labels}}} {cumulative}")
+            total = _format_value(value["sum"])
+            lines.append(f"{_series(metric.name + '_sum', key)} {total}")
+            lines.append(f"{_series(metric.name + '_count', key)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _observe_request(response):
+    if "metrics_started" in g:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - g.metrics_started,
+            blueprint=request.blueprint or "app",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
+def _flush_loop(directory, interval):
+    while True:
+        time.sleep(interval)
+        _flush(directory)
+
+
+def init_metrics(app):
+    """Register /metrics and request timing, and start flushing if shared."""
+    if not app.config["METRICS_ENABLED"]:
+        return
+    app.register_blueprint(metrics_bp)
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+
+    directory = app.config["METRICS_DIR"]
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        threading.Thread(
+            target=_flush_loop,
+            args=(directory, app.config["METRICS_FLUSH_SECONDS"]),
+            name="metrics-flush",
+            daemon=True,
+        ).start()
+        atexit.register(_flush, directory)
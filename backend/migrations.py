@@ -0,0 +1,99 @@
+"""Lightweight, idempotent schema upgrades for existing databases.
+
+``db.create_all()`` only creates missing tables, so columns and indexes
+added to existing models are applied here on startup.
+"""
+
+from models import ACCRUAL_TYPES_SQL, db
+
+
+def _backfill_balances():
+    from ledger import rebuild_balances
+
+    rebuild_balances()
+
+
+def _backfill_watermarks():
+    from accrual import repair_watermarks
+
+    repair_watermarks()
+
+
+def _dedupe_accruals():
+    """Delete duplicate accrual rows left by earlier concurrent catch-ups.
+
+    Must run before the unique accrual index can be created.
+    """
+    indexes = {i["name"] for i in db.inspect(db.engine).get_indexes("transactions")}
+    if "uq_transactions_accrual" in indexes:
+        return
+
+    result = db.session.execute(
+        db.text(
+            f"DELETE FROM transactions WHERE {ACCRUAL_TYPES_SQL} AND id NOT IN ("
+            f"SELECT MIN(id) FROM transactions WHERE {ACCRUAL_TYPES_SQL} "
+            "GROUP BY user_id, type, created_at)"
+        )
+    )
+    db.session.commit()
+    if result.rowcount:
+        _backfill_balances()
+
+
+# Float dollar columns converted to integer cents: (table, old column, new column)
+CENTS_COLUMNS = [
+    ("users", "monthly_allowance", "monthly_allowance_cents"),
+    ("users", "starting_balance", "starting_balance_cents"),
+    ("users", "balance", "balance_cents"),
+    ("transactions", "amount", "amount_cents"),
+    ("withdrawal_requests", "amount", "amount_cents"),
+]
+
+# (table, column, column DDL, backfill run once after the column is added)
+COLUMNS = [
+    ("users", "balance_cents", "INTEGER NOT NULL DEFAULT 0", _backfill_balances),
+    ("users", "ledger_version", "INTEGER NOT NULL DEFAULT 0", None),
+    ("users", "accrued_through", "DATE", _backfill_watermarks),
+    ("users", "ledger_updated_at", "DATETIME", None),
+]
+
+
+def _columns(table):
+    return {c["name"] for c in db.inspect(db.engine).get_columns(table)}
+
+
+def _convert_to_cents():
+    for table, old, new in CENTS_COLUMNS:
+        existing = _columns(table)
+        if old not in existing or new in existing:
+            continue
+        db.session.execute(
+            db.text(f"ALTER TABLE {table} ADD COLUMN {new} INTEGER NOT NULL DEFAULT 0")
+        )
+        db.session.execute(
+            db.text(f"UPDATE {table} SET {new} = CAST(ROUND({old} * 100) AS INTEGER)")
+        )
+        db.session.execute(db.text(f"ALTER TABLE {table} DROP COLUMN {old}"))
+        db.session.commit()
+
+
+def upgrade_schema():
+    """Add any missing columns and indexes, backfilling new columns."""
+    _convert_to_cents()
+
+    backfills = []
+    for table, column, ddl, backfill in COLUMNS:
+        if column in _columns(table):
+            continue
+        db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        if backfill:
+            backfills.append(backfill)
+    db.session.commit()
+
+    for backfill in backfills:
+        backfill()
+
+    _dedupe_accruals()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
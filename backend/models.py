@@ -1,14 +1,27 @@
 from datetime import date, datetime
+from functools import lru_cache
 from typing import List, Optional
 
+from flask import current_app
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Boolean, Date, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Index, Integer, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from money import to_dollars
+
 db = SQLAlchemy()
 
+# Transaction types written by catch-up
+ACCRUAL_TYPES_SQL = "type IN ('income', 'interest', 'penalty')"
+
+
+@lru_cache
+def _hash_prefix(method):
+    """Return the method prefix werkzeug stores for ``method``, with defaults filled in."""
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
 
 class User(UserMixin, db.Model):
     __tablename__ = "users"
@@ -18,9 +31,22 @@ class User(UserMixin, db.Model):
     password_hash: Mapped[str] = mapped_column(String(256), nullable=False)
     display_name: Mapped[str] = mapped_column(String(120), nullable=False)
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
-    monthly_allowance: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
-    starting_balance: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    # All money columns hold integer cents
+    monthly_allowance_cents: Mapped[int] = mapped_column(
+        Integer, default=0, nullable=False
+    )
+    starting_balance_cents: Mapped[int] = mapped_column(
+        Integer, default=0, nullable=False
+    )
     allowance_start_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    # Running total of the user's transactions, maintained by ledger.py
+    balance_cents: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Last day whose income and interest have been materialized by catch-up
+    accrued_through: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    # Bumped whenever a transaction or withdrawal request is written for the
+    # user; used as a cache key and, with ledger_updated_at, for HTTP validators
+    ledger_version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    ledger_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False
     )
@@ -42,19 +68,26 @@ class User(UserMixin, db.Model):
     )
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(
+            password, method=current_app.config["PASSWORD_HASH_METHOD"]
+        )
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        """True if the stored hash uses a different method or cost than configured."""
+        method = current_app.config["PASSWORD_HASH_METHOD"]
+        return self.password_hash.split("$", 1)[0] != _hash_prefix(method)
+
     def to_dict(self):
         return {
             "id": self.id,
             "username": self.username,
             "display_name": self.display_name,
             "is_admin": self.is_admin,
-            "monthly_allowance": self.monthly_allowance,
-            "starting_balance": self.starting_balance,
+            "monthly_allowance": to_dollars(self.monthly_allowance_cents),
+            "starting_balance": to_dollars(self.starting_balance_cents),
             "allowance_start_date": self.allowance_start_date.isoformat()
             if self.allowance_start_date
             else None,
@@ -63,11 +96,28 @@ class User(UserMixin, db.Model):
 
 class Transaction(db.Model):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Ledger order: balances, running balances, pagination, charts
+        Index("ix_transactions_user_created", "user_id", "created_at", "id"),
+        # Per-type lookups: last income, month-end interest, type filter
+        Index("ix_transactions_user_type_created", "user_id", "type", "created_at"),
+        # At most one accrued row per user, type and timestamp, so concurrent
+        # catch-up runs cannot insert the same day's income or interest twice
+        Index(
+            "uq_transactions_accrual",
+            "user_id",
+            "type",
+            "created_at",
+            unique=True,
+            sqlite_where=text(ACCRUAL_TYPES_SQL),
+            postgresql_where=text(ACCRUAL_TYPES_SQL),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
     type: Mapped[str] = mapped_column(String(20), nullable=False)
-    amount: Mapped[float] = mapped_column(Float, nullable=False)
+    amount_cents: Mapped[int] = mapped_column(Integer, nullable=False)
     description: Mapped[str] = mapped_column(String(256), default="")
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False
@@ -80,7 +130,7 @@ class Transaction(db.Model):
             "id": self.id,
             "user_id": self.user_id,
             "type": self.type,
-            "amount": self.amount,
+            "amount": to_dollars(self.amount_cents),
             "description": self.description,
             "created_at": self.created_at.isoformat(),
         }
@@ -88,10 +138,15 @@ class Transaction(db.Model):
 
 class WithdrawalRequest(db.Model):
     __tablename__ = "withdrawal_requests"
+    __table_args__ = (
+        Index("ix_withdrawal_requests_status_created", "status", "created_at"),
+        Index("ix_withdrawal_requests_user_created", "user_id", "created_at"),
+        Index("ix_withdrawal_requests_created", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
-    amount: Mapped[float] = mapped_column(Float, nullable=False)
+    amount_cents: Mapped[int] = mapped_column(Integer, nullable=False)
     reason: Mapped[str] = mapped_column(String(256), default="")
     status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
     created_at: Mapped[datetime] = mapped_column(
@@ -114,10 +169,68 @@ class WithdrawalRequest(db.Model):
         return {
             "id": self.id,
             "user_id": self.user_id,
-            "amount": self.amount,
+            "amount": to_dollars(self.amount_cents),
             "reason": self.reason,
             "status": self.status,
             "created_at": self.created_at.isoformat(),
             "resolved_at": self.resolved_at.isoformat() if self.resolved_at else None,
             "resolved_by": self.resolved_by,
         }
+
+
+# Totals for one user's closed calendar month, written by rollup.py. The raw
+# transactions stay in place; summaries let balance lookups skip over them.
+class MonthlySummary(db.Model):
+    __tablename__ = "monthly_summary"
+    __table_args__ = (
+        Index("uq_monthly_summary_user_month", "user_id", "month", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    # First day of the summarized month
+    month: Mapped[date] = mapped_column(Date, nullable=False)
+    opening_cents: Mapped[int] = mapped_column(Integer, nullable=False)
+    income_cents: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    interest_cents: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    penalty_cents: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    withdrawals_cents: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    adjustments_cents: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    closing_cents: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+# Parent notifications waiting to be sent by notifications.py
+class NotificationOutbox(db.Model):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (Index("ix_notification_outbox_next_attempt", "next_attempt_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    title: Mapped[str] = mapped_column(String(256), nullable=False)
+    message: Mapped[str] = mapped_column(String(1024), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+
+# Withdrawal request changes streamed to parents by events.py. AUTOINCREMENT
+# keeps ids from being reused after old rows are pruned, since clients resume
+# from the last id they saw.
+class RequestEvent(db.Model):
+    __tablename__ = "request_events"
+    __table_args__ = (
+        Index("ix_request_events_created", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    type: Mapped[str] = mapped_column(String(20), nullable=False)
+    request_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # JSON of the request as GET /api/admin/requests lists it
+    data: Mapped[str] = mapped_column(String(2048), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
@@ -0,0 +1,22 @@
+"""Money helpers: amounts are stored as integer cents and shown as dollars."""
+
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+
+
+def to_cents(value):
+    """Convert a dollar amount (number or numeric string) to integer cents.
+
+    Raises ValueError if the value is not a finite number.
+    """
+    try:
+        cents = Decimal(str(value)).scaleb(2).quantize(
+            Decimal(1), rounding=ROUND_HALF_EVEN
+        )
+        return int(cents)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid amount: {value!r}") from None
+
+
+def to_dollars(cents):
+    """Convert integer cents to a dollar amount for JSON output."""
+    return cents / 100
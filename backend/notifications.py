@@ -1,19 +1,183 @@
+"""Parent notifications via ntfy, sent in the background from an outbox table.
+
+notify_parent() only adds a row to ``notification_outbox`` in the caller's
+database transaction, so requests never wait on ntfy and a restart cannot lose
+an alert. A sender thread in the process that runs the background jobs (see
+jobs.py) wakes after a commit that queued a notification, waits briefly so a burst can be sent as a single push, and
+retries failures with exponential backoff over a pooled HTTP session.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
 import requests as http_requests
 from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import NotificationOutbox, db
+
+# Longest the sender sleeps between checks for due or abandoned rows
+POLL_SECONDS = 60
+# Rows claimed by a sender are skipped by other processes for this long
+CLAIM_SECONDS = 60
+MAX_BATCH = 20
+RETRY_MAX_SECONDS = 3600
+
+_wake = threading.Event()
+_stop = threading.Event()
 
 
 def notify_parent(title, message):
-    """Send a notification to the parent via ntfy. Fire and forget."""
-    server = current_app.config.get("NTFY_SERVER")
-    topic = current_app.config.get("NTFY_TOPIC")
-    if not server:
+    """Queue a notification to the parent; sent once the caller commits."""
+    if not current_app.config.get("NTFY_SERVER"):
         return
+    db.session.add(NotificationOutbox(title=title, message=message))
+    db.session.info["notification_queued"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("notification_queued", False):
+        _wake.set()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop("notification_queued", None)
+
+
+def retry_delay(attempts, base_seconds):
+    """Seconds to wait before retrying a notification that failed ``attempts`` times."""
+    return min(base_seconds * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def _claim_due(now):
+    """Claim up to MAX_BATCH due rows so no other process sends them."""
+    due = db.session.execute(
+        db.select(NotificationOutbox)
+        .filter(NotificationOutbox.next_attempt_at <= now)
+        .order_by(NotificationOutbox.id)
+        .limit(MAX_BATCH)
+    ).scalars().all()
+
+    claimed = []
+    for item in due:
+        result = db.session.execute(
+            db.update(NotificationOutbox)
+            .where(
+                NotificationOutbox.id == item.id,
+                NotificationOutbox.next_attempt_at == item.next_attempt_at,
+            )
+            .values(next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            claimed.append(item.id)
+    db.session.commit()
+    if not claimed:
+        return []
+    return db.session.execute(
+        db.select(NotificationOutbox)
+        .filter(NotificationOutbox.id.in_(claimed))
+        .order_by(NotificationOutbox.id)
+    ).scalars().all()
+
+
+def _combine(items):
+    """Return (title, message) for one push covering all ``items``."""
+    if len(items) == 1:
+        return items[0].title, items[0].message
+    titles = {item.title for item in items}
+    title = titles.pop() if len(titles) == 1 else "Allowance"
+    return f"{title} ({len(items)})", "\n".join(item.message for item in items)
+
+
+def deliver_due(http):
+    """Send due notifications as one push. Returns the number delivered."""
+    now = datetime.utcnow()
+    items = _claim_due(now)
+    if not items:
+        return 0
+
+    config = current_app.config
+    title, message = _combine(items)
     try:
-        http_requests.post(
-            f"{server}/{topic}",
+        response = http.post(
+            f"{config['NTFY_SERVER']}/{config['NTFY_TOPIC']}",
             data=message.encode("utf-8"),
             headers={"Title": title, "Priority": "default"},
             timeout=5,
         )
-    except Exception:
-        pass
+        response.raise_for_status()
+    except http_requests.RequestException as exc:
+        for item in items:
+            item.attempts += 1
+            if item.attempts >= config["NTFY_MAX_ATTEMPTS"]:
+                current_app.logger.error(
+                    "Dropping notification %r after %d attempts: %s",
+                    item.title,
+                    item.attempts,
+                    exc,
+                )
+                db.session.delete(item)
+            else:
+                delay = retry_delay(item.attempts, config["NTFY_RETRY_SECONDS"])
+                item.next_attempt_at = now + timedelta(seconds=delay)
+        db.session.commit()
+        current_app.logger.warning("ntfy delivery failed: %s", exc)
+        return 0
+
+    for item in items:
+        db.session.delete(item)
+    db.session.commit()
+    return len(items)
+
+
+def _seconds_until_next_due():
+    next_due = db.session.execute(
+        db.select(db.func.min(NotificationOutbox.next_attempt_at))
+    ).scalar()
+    if next_due is None:
+        return POLL_SECONDS
+    seconds = (next_due - datetime.utcnow()).total_seconds()
+    return min(max(seconds, 0), POLL_SECONDS)
+
+
+def _sender_loop(app):
+    http = http_requests.Session()
+    timeout = 0
+    while not _stop.is_set():
+        if _wake.wait(timeout):
+            # Let the rest of a burst reach the outbox first
+            _stop.wait(app.config["NTFY_BATCH_SECONDS"])
+        _wake.clear()
+        if _stop.is_set():
+            break
+        with app.app_context():
+            try:
+                while deliver_due(http) == MAX_BATCH:
+                    pass
+                timeout = _seconds_until_next_due()
+            except Exception:
+                app.logger.exception("Notification delivery failed")
+                timeout = POLL_SECONDS
+            finally:
+                db.session.remove()
+
+
+def start_sender(app):
+    """Start the background notification sender for this process."""
+    _stop.clear()
+    thread = threading.Thread(
+        target=_sender_loop, args=(app,), name="notification-sender", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def stop_sender(thread):
+    """Stop a sender started by start_sender() and wait for it to exit."""
+    _stop.set()
+    _wake.set()
+    thread.join()
@@ -0,0 +1,34 @@
+"""Opaque cursors for keyset pagination over (created_at, id) ordered rows."""
+
+import base64
+import json
+from datetime import datetime
+
+from models import db
+
+
+def encode_cursor(created_at, row_id, **extra):
+    """Encode the position after a row (plus any extra state) as a cursor."""
+    payload = {"t": created_at.isoformat(), "id": row_id, **extra}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (created_at, id, extra). Raises ValueError if invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        created_at = datetime.fromisoformat(payload.pop("t"))
+        row_id = int(payload.pop("id"))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Invalid cursor") from None
+    return created_at, row_id, payload
+
+
+def before(model, created_at, row_id):
+    """SQL condition: rows that sort after the cursor in newest-first order."""
+    return db.or_(
+        model.created_at < created_at,
+        db.and_(model.created_at == created_at, model.id < row_id),
+    )
@@ -0,0 +1,135 @@
+"""What-if balance projections, computed without writing any transactions.
+
+A projection follows the catch-up rules from schedule.py: daily income for
+the rest of the current month and every following month, then interest or a
+penalty on each month-end balance. Each scenario also takes a fixed
+withdrawal on the 1st of every projected month. Only month-end balances earn
+or cost interest, so the simulation steps a month at a time and advances all
+scenarios together.
+"""
+
+from datetime import date, timedelta
+
+from flask import Blueprint, request
+from flask_login import current_user, login_required
+
+from catchup import run_catchup
+from models import User, db
+from money import to_cents, to_dollars
+from schedule import build_schedule, current_rates, month_end_charge
+
+projection_bp = Blueprint("projection", __name__)
+
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 600
+MAX_SCENARIOS = 10
+
+
+def project(opening, schedule, rates, withdrawals):
+    """Simulate month-end balances (cents) for several withdrawal scenarios.
+
+    ``opening`` is the balance just before the schedule starts and
+    ``withdrawals`` the monthly withdrawal of each scenario, taken on the 1st
+    of every month in the schedule. Returns one (MonthCalendar, balances,
+    charges) tuple per month the schedule closes, where ``balances`` holds
+    each scenario's balance after the month's interest and ``charges`` the
+    signed interest (+) or penalty (-) it got.
+    """
+    balances = [opening] * len(withdrawals)
+    months = []
+    for segment in schedule.months:
+        income = segment.daily * (segment.last - segment.first)
+        if segment.first == 0:
+            balances = [b + income - w for b, w in zip(balances, withdrawals)]
+        else:
+            balances = [b + income for b in balances]
+        if not segment.closes:
+            continue
+
+        charges = []
+        for balance in balances:
+            charge = month_end_charge(balance, rates)
+            if charge is None:
+                charges.append(0)
+            else:
+                txn_type, amount = charge
+                charges.append(amount if txn_type == "interest" else -amount)
+        balances = [b + c for b, c in zip(balances, charges)]
+        months.append((segment.calendar, balances, charges))
+    return months
+
+
+def _parse_withdrawals(values):
+    if not values:
+        return [0]
+    if len(values) > MAX_SCENARIOS:
+        raise ValueError(f"At most {MAX_SCENARIOS} scenarios")
+    withdrawals = [to_cents(value) for value in values]
+    if any(cents < 0 for cents in withdrawals):
+        raise ValueError("Withdrawals cannot be negative")
+    return withdrawals
+
+
+def _horizon(today, months):
+    """Return the last day of the month ``months`` months after today's."""
+    index = today.year * 12 + today.month - 1 + months + 1
+    return date(index // 12, index % 12 + 1, 1) - timedelta(days=1)
+
+
+@projection_bp.route("/api/projection")
+@login_required
+def projection():
+    """Project the balance to the end of the month ``months`` months from now.
+
+    Each ``withdrawal`` (dollars, repeatable) is one scenario. Parents pass
+    ``user_id`` to project a child's balance.
+    """
+    months = request.args.get("months", DEFAULT_MONTHS, type=int)
+    if not 1 <= months <= MAX_MONTHS:
+        return {"error": f"months must be between 1 and {MAX_MONTHS}"}, 400
+    try:
+        withdrawals = _parse_withdrawals(request.args.getlist("withdrawal"))
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+
+    user = current_user
+    if current_user.is_admin:
+        user_id = request.args.get("user_id", type=int)
+        user = db.session.get(User, user_id) if user_id else None
+        if not user or user.is_admin:
+            return {"error": "user_id of a child is required"}, 400
+
+    run_catchup(user)
+    today = date.today()
+    opening = user.balance_cents
+    schedule = build_schedule(
+        user.monthly_allowance_cents, today + timedelta(days=1), _horizon(today, months)
+    )
+    results = project(opening, schedule, current_rates(), withdrawals)
+
+    scenarios = []
+    for i, withdrawal in enumerate(withdrawals):
+        charged = [charges[i] for _, _, charges in results]
+        scenarios.append(
+            {
+                "monthly_withdrawal": to_dollars(withdrawal),
+                "final_balance": to_dollars(results[-1][1][i]),
+                "total_interest": to_dollars(sum(c for c in charged if c > 0)),
+                "total_penalty": to_dollars(-sum(c for c in charged if c < 0)),
+                "months": [
+                    {
+                        "month": f"{month.year}-{month.month:02d}",
+                        "balance": to_dollars(balances[i]),
+                        "interest": to_dollars(charges[i]),
+                    }
+                    for month, balances, charges in results
+                ],
+            }
+        )
+
+    return {
+        "as_of": today.isoformat(),
+        "balance": to_dollars(opening),
+        "monthly_allowance": to_dollars(user.monthly_allowance_cents),
+        "scenarios": scenarios,
+    }
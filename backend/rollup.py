@@ -0,0 +1,127 @@
+"""Monthly rollups: compact closed months of the ledger into summaries.
+
+A month is closed once it is over and, for children with an allowance, catch-up
+has materialized its last day (so its month-end interest is in the ledger).
+Balance lookups start from the latest closed summary and only sum the raw
+transactions after it. ledger.py drops summaries that a back-dated write
+makes stale; the next compaction rebuilds them.
+"""
+
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy.exc import IntegrityError
+
+from ledger import balance_delta
+from models import MonthlySummary, Transaction, User, db
+
+# Transaction type -> MonthlySummary total it is rolled into
+SUMMARY_COLUMNS = {
+    "income": "income_cents",
+    "interest": "interest_cents",
+    "penalty": "penalty_cents",
+    "withdrawal": "withdrawals_cents",
+    "adjustment": "adjustments_cents",
+}
+
+
+def next_month(month):
+    """Return the first day of the month after ``month``."""
+    return (month.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def month_start(moment):
+    """Return midnight on the first day of ``moment``'s month."""
+    return datetime(moment.year, moment.month, 1)
+
+
+def summary_before(user_id, moment):
+    """Return the latest summary of a month that ended at or before ``moment``."""
+    return db.session.execute(
+        db.select(MonthlySummary)
+        .filter(
+            MonthlySummary.user_id == user_id,
+            MonthlySummary.month < moment.date().replace(day=1),
+        )
+        .order_by(MonthlySummary.month.desc())
+        .limit(1)
+    ).scalar()
+
+
+def closed_through(user, today=None):
+    """Return the first day of the user's earliest month that is still open."""
+    limit = (today or date.today()).replace(day=1)
+    if user.monthly_allowance_cents > 0:
+        if user.accrued_through is None:
+            return None
+        limit = min(limit, (user.accrued_through + timedelta(days=1)).replace(day=1))
+    return limit
+
+
+def compact_user(user, today=None):
+    """Write summaries for the user's closed months that lack one.
+
+    Returns the number of summaries written. The caller commits.
+    """
+    limit = closed_through(user, today)
+    if limit is None:
+        return 0
+
+    last = summary_before(user.id, month_start(limit))
+    # extract() rather than strftime() so the buckets work on any dialect
+    year = db.extract("year", Transaction.created_at)
+    month_number = db.extract("month", Transaction.created_at)
+    query = db.select(
+        year,
+        month_number,
+        Transaction.type,
+        db.func.sum(Transaction.amount_cents),
+    ).filter(Transaction.user_id == user.id, Transaction.created_at < month_start(limit))
+    if last:
+        query = query.filter(Transaction.created_at >= month_start(next_month(last.month)))
+
+    totals = {}
+    for year_value, month_value, txn_type, amount_cents in db.session.execute(
+        query.group_by(year, month_number, Transaction.type)
+    ):
+        key = date(int(year_value), int(month_value), 1)
+        totals.setdefault(key, {})[txn_type] = amount_cents
+
+    if last:
+        month, closing = next_month(last.month), last.closing_cents
+    elif totals:
+        month, closing = min(totals), 0
+    else:
+        return 0
+
+    written = 0
+    while month < limit:
+        summary = MonthlySummary(user_id=user.id, month=month, opening_cents=closing)
+        for txn_type, amount_cents in totals.get(month, {}).items():
+            setattr(summary, SUMMARY_COLUMNS[txn_type], amount_cents)
+            closing += balance_delta(txn_type, amount_cents)
+        summary.closing_cents = closing
+        db.session.add(summary)
+        written += 1
+        month = next_month(month)
+    return written
+
+
+def compact_all():
+    """Compact closed months for every user. Returns the summaries written."""
+    written = 0
+    for user in db.session.execute(db.select(User)).scalars().all():
+        try:
+            written += compact_user(user)
+            db.session.commit()
+        except IntegrityError:
+            # Another process compacted this user concurrently
+            db.session.rollback()
+    return written
+
+
+@click.command("compact")
+def compact_command():
+    """Roll closed months of the ledger into monthly summaries."""
+    written = compact_all()
+    click.echo(f"Wrote {written} monthly summaries.")
@@ -0,0 +1,122 @@
+"""The accrual calendar: daily income and month-end interest, precomputed.
+
+Catch-up (and anything that needs to predict it) follows the same rules: one
+income row per day at midnight worth the monthly allowance divided by that
+month's length, then on the month's last day an interest or penalty row at
+23:59:59 computed from the balance at 23:59:58. Month calendars, daily amounts
+and monthly rate factors are cached per process, and build_schedule() lays a
+date range out as month segments.
+"""
+
+import calendar
+from datetime import date, datetime
+from functools import lru_cache
+from typing import NamedTuple
+
+from flask import current_app
+
+
+class MonthCalendar(NamedTuple):
+    year: int
+    month: int
+    # Midnight of every day in the month
+    days: tuple
+    # A month-end balance includes every row up to this moment
+    balance_cutoff: datetime
+    # When the month's interest or penalty row is written
+    interest_at: datetime
+    name: str
+
+
+@lru_cache(maxsize=1200)
+def month_calendar(year, month):
+    length = calendar.monthrange(year, month)[1]
+    return MonthCalendar(
+        year=year,
+        month=month,
+        days=tuple(datetime(year, month, day) for day in range(1, length + 1)),
+        balance_cutoff=datetime(year, month, length, 23, 59, 58),
+        interest_at=datetime(year, month, length, 23, 59, 59),
+        name=datetime(year, month, 1).strftime("%B %Y"),
+    )
+
+
+@lru_cache(maxsize=4096)
+def daily_amount(allowance_cents, year, month):
+    """Return the daily income (cents) for a monthly allowance in a given month."""
+    return round(allowance_cents / len(month_calendar(year, month).days))
+
+
+@lru_cache(maxsize=64)
+def monthly_rates(savings_apy, credit_apr):
+    """Return the (savings, credit) rates applied to a month-end balance."""
+    return (1 + savings_apy) ** (1 / 12) - 1, credit_apr / 12
+
+
+def current_rates():
+    """Return monthly_rates() for the app's configured interest rates."""
+    config = current_app.config
+    return monthly_rates(config["SAVINGS_INTEREST_RATE"], config["CREDIT_INTEREST_RATE"])
+
+
+def month_end_charge(balance, rates):
+    """Return (type, cents) paid or charged on a month-end balance, or None."""
+    savings, credit = rates
+    if balance > 0:
+        interest = round(balance * savings)
+        if interest > 0:
+            return "interest", interest
+    elif balance < 0:
+        penalty = round(abs(balance) * credit)
+        if penalty > 0:
+            return "penalty", penalty
+    return None
+
+
+class MonthSegment(NamedTuple):
+    """The part of one month covered by a schedule."""
+
+    calendar: MonthCalendar
+    # Slice of calendar.days in the schedule
+    first: int
+    last: int
+    daily: int
+
+    @property
+    def days(self):
+        return self.calendar.days[self.first:self.last]
+
+    @property
+    def closes(self):
+        """True if the schedule includes the month's last day."""
+        return self.last == len(self.calendar.days)
+
+
+class Schedule(NamedTuple):
+    """Daily income from ``start_date`` to an end date, inclusive."""
+
+    start_date: date
+    # One MonthSegment per month touched, in order
+    months: tuple
+
+
+@lru_cache(maxsize=256)
+def build_schedule(allowance_cents, start_date, end_date):
+    """Return the Schedule of daily income from ``start_date`` to ``end_date``.
+
+    Results are cached (children often share an allowance and catch-up
+    range), so callers must not modify them.
+    """
+    months = []
+    if start_date <= end_date:
+        first_month = (start_date.year, start_date.month)
+        last_month = (end_date.year, end_date.month)
+        year, month = first_month
+        while (year, month) <= last_month:
+            month_days = month_calendar(year, month)
+            first = start_date.day - 1 if (year, month) == first_month else 0
+            last = end_date.day if (year, month) == last_month else len(month_days.days)
+            daily = daily_amount(allowance_cents, year, month)
+            months.append(MonthSegment(month_days, first, last, daily))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return Schedule(start_date, tuple(months))
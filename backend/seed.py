@@ -27,7 +27,7 @@ def seed_command(admin_username, admin_password):
         username=admin_username,
         display_name="Parent",
         is_admin=True,
-        monthly_allowance=0,
+        monthly_allowance_cents=0,
     )
     admin.set_password(admin_password)
     db.session.add(admin)
@@ -0,0 +1,142 @@
+"""Serving the SvelteKit build from an index made once at startup.
+
+Every file under STATIC_FOLDER is stat'ed when the app starts, along with any
+precompressed ``.br``/``.gz`` siblings (``precompress: true`` in
+svelte.config.js). Requests are then answered from the index without touching
+the filesystem until the file is sent: the best encoding the client accepts,
+a strong ETag per encoding, Range support, and 304s straight from memory.
+Hashed assets under ``_app/immutable/`` are cached for a year; everything else
+must be revalidated. Unknown paths get the SPA fallback page, except under
+``_app/``, where a missing asset is a 404.
+
+Rebuilding the frontend requires a restart to pick up the new files.
+"""
+
+import mimetypes
+import os
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from flask import current_app, request
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
+
+FALLBACK = "200.html"
+IMMUTABLE_PREFIX = "_app/immutable/"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Precompressed sibling suffix -> Content-Encoding, in order of preference
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+
+class StaticFile(NamedTuple):
+    path: str
+    size: int
+    last_modified: datetime
+    etag: str
+    mimetype: str
+    immutable: bool
+    # Content-Encoding of a precompressed variant
+    encoding: Optional[str] = None
+
+
+def _entry(path, relative, mimetype, encoding=None):
+    stat = os.stat(path)
+    suffix = f"-{encoding}" if encoding else ""
+    return StaticFile(
+        path=path,
+        size=stat.st_size,
+        last_modified=datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}",
+        mimetype=mimetype,
+        immutable=relative.startswith(IMMUTABLE_PREFIX),
+        encoding=encoding,
+    )
+
+
+def build_index(root):
+    """Return {url path: [StaticFile, precompressed variants...]} for a build."""
+    index = {}
+    if not os.path.isdir(root):
+        return index
+    compressed = tuple(suffix for suffix, _ in ENCODINGS)
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.endswith(compressed):
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            variants = [_entry(path, relative, mimetype)]
+            for suffix, encoding in ENCODINGS:
+                if os.path.isfile(path + suffix):
+                    variants.append(_entry(path + suffix, relative, mimetype, encoding))
+            index[relative] = variants
+    return index
+
+
+def _choose(variants):
+    """Return the variant to send for this request's Accept-Encoding."""
+    accepted = request.accept_encodings
+    for variant in variants[1:]:
+        if accepted[variant.encoding]:
+            return variant
+    return variants[0]
+
+
+def _headers(response, variants, chosen):
+    response.set_etag(chosen.etag)
+    response.last_modified = chosen.last_modified
+    if len(variants) > 1:
+        response.vary.add("Accept-Encoding")
+    if chosen.immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def send_static(variants):
+    """Send an indexed file, honoring Accept-Encoding, conditionals and Range."""
+    chosen = _choose(variants)
+    response_class = current_app.response_class
+    if not is_resource_modified(
+        request.environ, etag=chosen.etag, last_modified=chosen.last_modified
+    ):
+        return _headers(response_class(status=304), variants, chosen)
+
+    # wsgi.file_wrapper lets gunicorn use sendfile() for the body
+    response = response_class(
+        wrap_file(request.environ, open(chosen.path, "rb")),
+        mimetype=chosen.mimetype,
+        direct_passthrough=True,
+    )
+    response.content_length = chosen.size
+    if chosen.encoding:
+        response.content_encoding = chosen.encoding
+    _headers(response, variants, chosen)
+    return response.make_conditional(
+        request.environ, accept_ranges=True, complete_length=chosen.size
+    )
+
+
+def init_static(app):
+    """Index STATIC_FOLDER and serve it, with the SPA fallback, at ``/``."""
+    index = build_index(os.path.abspath(app.config["STATIC_FOLDER"]))
+    app.extensions["static_index"] = index
+
+    @app.route("/", defaults={"path": ""})
+    @app.route("/<path:path>")
+    def serve_frontend(path):
+        variants = index.get(path)
+        if variants is None and not path.startswith("_app/"):
+            variants = index.get(FALLBACK)
+        if variants is None:
+            if not index:
+                return (
+                    "Frontend not built yet. Run 'npm run build' in the frontend directory.",
+                    404,
+                )
+            return "Not found", 404
+        return send_static(variants)
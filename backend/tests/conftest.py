@@ -0,0 +1,114 @@
+"""Shared fixtures: one app on a throwaway SQLite file for the whole run.
+
+Tests share the database, so each one creates its own users (the factories
+below give them unique names) and only looks at rows it made.
+"""
+
+import itertools
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+# The backend's modules import each other by name, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import Transaction, User, db  # noqa: E402
+from money import to_cents  # noqa: E402
+
+PASSWORD = "secret"
+
+_names = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    database = tmp_path_factory.mktemp("data") / "allowance.db"
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{database}")
+        app = create_app()
+    app.config.update(
+        TESTING=True,
+        # Hashing cost is not under test; keep logins fast
+        PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+    )
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def ctx(app):
+    """Run the test inside an app context."""
+    with app.app_context():
+        yield
+
+
+def _make_child(years=0, monthly_allowance=20.0, starting_balance=0.0, name="child"):
+    user = User(
+        username=f"{name}-{next(_names)}",
+        display_name=name,
+        monthly_allowance_cents=to_cents(monthly_allowance),
+        starting_balance_cents=to_cents(starting_balance),
+        allowance_start_date=date.today() - timedelta(days=round(365.25 * years)),
+    )
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _make_parent():
+    user = User(username=f"parent-{next(_names)}", display_name="Parent", is_admin=True)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _login(client, username):
+    client.post("/api/logout")
+    response = client.post("/api/login", json={"username": username, "password": PASSWORD})
+    assert response.status_code == 200, response.get_json()
+
+
+@pytest.fixture
+def make_child(app):
+    """Factory for children whose allowance started ``years`` ago.
+
+    Like make_parent, it needs an app context (see ``ctx``).
+    """
+    return _make_child
+
+
+@pytest.fixture
+def make_parent(app):
+    return _make_parent
+
+
+@pytest.fixture
+def login():
+    """Log a test client in (replacing any session) as ``username``."""
+    return _login
+
+
+def _ledger(user):
+    return db.session.execute(
+        db.select(Transaction.type, Transaction.amount_cents, Transaction.created_at)
+        .filter_by(user_id=user.id)
+        .order_by(Transaction.created_at, Transaction.id)
+    ).all()
+
+
+@pytest.fixture
+def ledger(app):
+    """Return a user's (type, amount_cents, created_at) rows in ledger order."""
+    return _ledger
@@ -0,0 +1,61 @@
+"""Logins upgrade outdated hashes; the identity cache never serves stale ledger state."""
+
+from datetime import date, timedelta
+
+from models import User, db
+
+
+def _hash_method(app, username):
+    with app.app_context():
+        user = db.session.execute(db.select(User).filter_by(username=username)).scalar_one()
+        return user.password_hash.split("$", 1)[0]
+
+
+def test_login_rehashes_an_outdated_password(app, client, login, make_child, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setitem(app.config, "PASSWORD_HASH_METHOD", "pbkdf2:sha256:500")
+        with app.app_context():
+            username = make_child().username
+    assert _hash_method(app, username) == "pbkdf2:sha256:500"
+
+    login(client, username)
+    assert _hash_method(app, username) == app.config["PASSWORD_HASH_METHOD"]
+
+
+def test_allowance_change_is_not_served_from_the_cache(app, client, login, make_child):
+    with app.app_context():
+        child = make_child(monthly_allowance=20.0)
+        username, child_id = child.username, child.id
+    login(client, username)
+    assert client.get("/api/me").get_json()["user"]["monthly_allowance"] == 20.0
+
+    # As another worker would, leaving this process's cached copy in place
+    with app.app_context():
+        db.session.get(User, child_id).monthly_allowance_cents = 3000
+        db.session.commit()
+    assert client.get("/api/me").get_json()["user"]["monthly_allowance"] == 30.0
+
+
+def test_catchup_never_uses_cached_allowance_settings(app, client, login, make_child, ledger):
+    with app.app_context():
+        child = make_child(monthly_allowance=0.0)
+        username, child_id = child.username, child.id
+    login(client, username)
+    client.get("/api/me")
+
+    # Another worker starts the allowance a year back with a starting balance
+    start = date.today() - timedelta(days=365)
+    with app.app_context():
+        child = db.session.get(User, child_id)
+        child.monthly_allowance_cents = 3000
+        child.allowance_start_date = start
+        child.starting_balance_cents = 5000
+        db.session.commit()
+    assert client.get("/api/dashboard").status_code == 200
+
+    with app.app_context():
+        rows = ledger(db.session.get(User, child_id))
+    incomes = [created_at.date() for txn_type, _, created_at in rows if txn_type == "income"]
+    assert incomes[0] == start
+    assert len(incomes) == 366
+    assert ("adjustment", 5000) in [(txn_type, amount) for txn_type, amount, _ in rows]
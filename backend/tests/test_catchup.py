@@ -0,0 +1,89 @@
+"""The bulk catch-up path writes exactly what the per-day loop writes."""
+
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from catchup import run_catchup, run_catchup_many
+from ledger import bulk_add_transactions
+from models import MonthlySummary, Transaction, User, db
+from rollup import compact_user
+
+
+@pytest.mark.parametrize("starting_balance", [-15.0, 40.0])
+def test_bulk_matches_per_day(ctx, make_child, ledger, starting_balance):
+    bulk = make_child(years=2, starting_balance=starting_balance)
+    per_day = make_child(years=2, starting_balance=starting_balance)
+
+    run_catchup(bulk, bulk=True)
+    run_catchup(per_day, bulk=False)
+
+    rows = ledger(bulk)
+    assert len(rows) > 700
+    assert {"income", "interest" if starting_balance > 0 else "penalty"} <= {
+        txn_type for txn_type, _, _ in rows
+    }
+    assert rows == ledger(per_day)
+
+
+@pytest.fixture
+def large_family(ctx):
+    """More children than SQLite allows terms in one OR expression.
+
+    They are deleted afterwards so later tests that go over every child
+    (the admin list, compact_all) stay fast.
+    """
+    start = date.today() - timedelta(days=40)
+    children = [
+        User(
+            username=f"large-family-{n}",
+            display_name="Child",
+            monthly_allowance_cents=10_000,
+            starting_balance_cents=50_000,
+            allowance_start_date=start,
+            password_hash="!",
+        )
+        for n in range(1201)
+    ]
+    db.session.add_all(children)
+    db.session.commit()
+    yield children
+    db.session.rollback()
+    ids = [child.id for child in children]
+    for model in (Transaction, MonthlySummary):
+        db.session.execute(db.delete(model).where(model.user_id.in_(ids)))
+    db.session.execute(db.delete(User).where(User.id.in_(ids)))
+    db.session.commit()
+
+
+def test_large_family_catches_up_together(large_family, ledger):
+    children = list(large_family)
+    start = children[0].allowance_start_date
+    alone = children.pop()
+
+    run_catchup_many(children)
+    run_catchup(alone)
+    assert all(child.accrued_through == date.today() for child in children)
+    assert ledger(children[0]) == ledger(children[-1]) == ledger(alone)
+
+    # A back-dated write for every child drops their stale summaries
+    for child in children[:3]:
+        compact_user(child)
+    db.session.commit()
+    summaries = db.select(MonthlySummary).filter(
+        MonthlySummary.user_id.in_([child.id for child in children[:3]])
+    )
+    assert db.session.execute(summaries).first()
+    bulk_add_transactions(
+        [
+            {
+                "user_id": child.id,
+                "type": "adjustment",
+                "amount_cents": 1,
+                "created_at": datetime.combine(start, time(12)),
+            }
+            for child in children
+        ]
+    )
+    db.session.commit()
+    assert not db.session.execute(summaries).first()
@@ -0,0 +1,92 @@
+"""ETag/Last-Modified revalidation of the child's views."""
+
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from catchup import run_catchup
+from instrumentation import query_budget
+from models import User, db
+
+# Child views answered with 304 Not Modified while the ledger is unchanged
+CONDITIONAL_URLS = [
+    "/api/dashboard",
+    "/api/dashboard?days=365",
+    "/api/transactions",
+    "/api/transactions?cursor=&count=1",
+    "/api/withdrawals",
+]
+
+
+@pytest.fixture
+def caught_up_child(app, client, login, make_child, make_parent):
+    """A parent and a caught-up child; the client is logged in as the child."""
+    with app.app_context():
+        parent = make_parent()
+        child = make_child(years=2, starting_balance=10.0)
+        run_catchup(child)
+        users = {"child": child.username, "parent": parent.username, "child_id": child.id}
+    login(client, users["child"])
+    return users
+
+
+def _validators(client):
+    found = {}
+    for url in CONDITIONAL_URLS:
+        response = client.get(url)
+        assert response.status_code == 200, url
+        found[url] = (response.headers["ETag"], response.headers["Last-Modified"])
+    return found
+
+
+def _conditional_headers(found):
+    """Yield (url, header, value) for each view and each of its validators."""
+    for url, (etag, last_modified) in found.items():
+        yield url, "If-None-Match", etag
+        yield url, "If-Modified-Since", last_modified
+
+
+def test_unchanged_views_are_not_modified(app, client, caught_up_child):
+    # Last-Modified has one-second resolution
+    time.sleep(1)
+    found = _validators(client)
+    for url, header, value in _conditional_headers(found):
+        with app.app_context(), query_budget(1):
+            response = client.get(url, headers={header: value})
+        assert response.status_code == 304, f"{url} with {header}"
+
+
+def test_withdrawal_request_refreshes_views(client, caught_up_child):
+    found = _validators(client)
+    time.sleep(1)
+    client.post("/api/withdrawals", json={"amount": 1, "reason": "conditional"})
+    for url, header, value in _conditional_headers(found):
+        response = client.get(url, headers={header: value})
+        assert response.status_code == 200, f"{url} with {header}"
+
+
+def test_denial_refreshes_views(client, login, caught_up_child):
+    client.post("/api/withdrawals", json={"amount": 1, "reason": "conditional"})
+    found = _validators(client)
+    time.sleep(1)
+    login(client, caught_up_child["parent"])
+    pending = client.get("/api/admin/requests").get_json()
+    request_id = next(r["id"] for r in pending if r["user_id"] == caught_up_child["child_id"])
+    client.put(f"/api/admin/requests/{request_id}", json={"status": "denied"})
+    login(client, caught_up_child["child"])
+    for url, header, value in _conditional_headers(found):
+        response = client.get(url, headers={header: value})
+        assert response.status_code == 200, f"{url} with {header}"
+
+
+def test_pending_catchup_refreshes_views(app, client, caught_up_child):
+    found = _validators(client)
+    for url, header, value in _conditional_headers(found):
+        # As after midnight, before the day's catch-up has run
+        with app.app_context():
+            child = db.session.get(User, caught_up_child["child_id"])
+            child.accrued_through = date.today() - timedelta(days=1)
+            db.session.commit()
+        response = client.get(url, headers={header: value})
+        assert response.status_code == 200, f"{url} with {header}"
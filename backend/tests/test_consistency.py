@@ -0,0 +1,163 @@
+"""Balance, running balance, charts and summaries agree on random ledgers.
+
+Hypothesis drives a child (caught up in bulk) and a twin (caught up day by
+day) through the same random writes, catch-ups and compactions, and checks
+after every step that all the ways of reading the ledger agree.
+"""
+
+import bisect
+import itertools
+from datetime import date, datetime, timedelta
+
+from hypothesis import HealthCheck, settings
+from hypothesis import strategies as st
+from hypothesis.stateful import (
+    RuleBasedStateMachine,
+    initialize,
+    invariant,
+    rule,
+    run_state_machine_as_test,
+)
+
+from catchup import get_balance, run_catchup, transactions_with_balance
+from dashboard import CHART_WINDOWS, balance_chart
+from ledger import add_transaction, balance_delta, ledger_balances
+from models import MonthlySummary, Transaction, User, db
+from money import to_dollars
+from rollup import compact_user, month_start, next_month
+
+_names = itertools.count()
+
+
+class LedgerMachine(RuleBasedStateMachine):
+    """One random child and its per-day twin; the test binds ``app`` and ``ledger``."""
+
+    app = None
+    ledger = None
+
+    def _children(self):
+        return db.session.get(User, self.user_id), db.session.get(User, self.twin_id)
+
+    @initialize(
+        allowance_cents=st.integers(1, 10_000),
+        starting_cents=st.integers(-20_000, 20_000),
+        days_back=st.integers(0, 800),
+    )
+    def create_children(self, allowance_cents, starting_cents, days_back):
+        self.now = datetime.now()
+        self.days_back = days_back
+        ids = []
+        with self.app.app_context():
+            for suffix in ("", "-per-day"):
+                user = User(
+                    username=f"consistency-{next(_names)}{suffix}",
+                    display_name="Consistency",
+                    monthly_allowance_cents=allowance_cents,
+                    starting_balance_cents=starting_cents,
+                    allowance_start_date=date.today() - timedelta(days=days_back),
+                )
+                user.password_hash = "!"
+                db.session.add(user)
+                db.session.commit()
+                ids.append(user.id)
+        self.user_id, self.twin_id = ids
+
+    @rule(
+        txn_type=st.sampled_from(("withdrawal", "adjustment")),
+        amount_cents=st.integers(1, 50_000),
+        negative=st.booleans(),
+        age=st.floats(0, 1),
+    )
+    def write(self, txn_type, amount_cents, negative, age):
+        """Write the same transaction, possibly back-dated, to both children."""
+        if txn_type == "adjustment" and negative:
+            amount_cents = -amount_cents
+        created_at = self.now - timedelta(seconds=round(age * self.days_back * 86_400))
+        with self.app.app_context():
+            for user in self._children():
+                add_transaction(
+                    Transaction(
+                        user_id=user.id,
+                        type=txn_type,
+                        amount_cents=amount_cents,
+                        created_at=created_at,
+                    )
+                )
+            db.session.commit()
+
+    @rule()
+    def catch_up(self):
+        with self.app.app_context():
+            user, twin = self._children()
+            run_catchup(user)
+            run_catchup(twin, bulk=False)
+
+    @rule()
+    def compact(self):
+        with self.app.app_context():
+            user, _ = self._children()
+            compact_user(user)
+            db.session.commit()
+
+    @invariant()
+    def ledgers_agree(self):
+        with self.app.app_context():
+            user, twin = self._children()
+            rows = self.ledger(user)
+            assert rows == self.ledger(twin), "bulk and per-day catch-up differ"
+
+            balance = get_balance(user)
+            assert balance == ledger_balances().get(user.id, 0)
+            assert get_balance(user, as_of=datetime.now()) == balance
+
+            # Balance at the end of every row, to check the other readers against
+            times = [created_at for _, _, created_at in rows]
+            totals = list(
+                itertools.accumulate(
+                    (balance_delta(txn_type, amount) for txn_type, amount, _ in rows),
+                    initial=0,
+                )
+            )
+
+            def balance_before(moment):
+                return totals[bisect.bisect_left(times, moment)]
+
+            # A stale summary left behind by a back-dated write fails here
+            summaries = db.session.execute(
+                db.select(MonthlySummary).filter_by(user_id=user.id)
+            ).scalars()
+            for summary in summaries:
+                end = month_start(next_month(summary.month))
+                assert summary.closing_cents == balance_before(end), f"summary for {summary.month}"
+
+            with_balance = db.session.execute(transactions_with_balance(user)).all()
+            running = 0
+            for txn, balance_after in reversed(with_balance):
+                running += balance_delta(txn.type, txn.amount_cents)
+                assert balance_after == running, f"running balance at transaction {txn.id}"
+            if with_balance:
+                assert with_balance[0][1] == balance
+
+            for days in CHART_WINDOWS:
+                chart = balance_chart(user, days)
+                assert chart["balances"][-1] == to_dollars(balance)
+                for label, value in zip(chart["labels"][1:], chart["balances"][1:]):
+                    end_of_day = datetime.fromisoformat(label) + timedelta(days=1)
+                    assert value == to_dollars(balance_before(end_of_day)), (
+                        f"{days}-day chart on {label}"
+                    )
+
+
+def test_random_ledgers_stay_consistent(app, ledger):
+    machine = type(
+        "BoundLedgerMachine", (LedgerMachine,), {"app": app, "ledger": staticmethod(ledger)}
+    )
+    run_state_machine_as_test(
+        machine,
+        settings=settings(
+            max_examples=40,
+            stateful_step_count=12,
+            deadline=None,
+            suppress_health_check=[HealthCheck.too_slow],
+        ),
+    )
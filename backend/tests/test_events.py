@@ -0,0 +1,189 @@
+"""Live withdrawal request events streamed to parents."""
+
+import json
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+import events
+from events import BUSY_RETRY_MS, EventBuffer, StreamEvent
+from models import db
+
+STREAM_URL = "/api/admin/requests/stream"
+
+
+@pytest.fixture
+def stream_clients(app, login, make_child, make_parent, monkeypatch):
+    """Logged-in clients for a parent and a child, with short stream timings."""
+    monkeypatch.setitem(app.config, "EVENTS_STREAM_SECONDS", 5)
+    monkeypatch.setitem(app.config, "EVENTS_HEARTBEAT_SECONDS", 0.1)
+    monkeypatch.setitem(app.config, "EVENTS_POLL_SECONDS", 0.1)
+    with app.app_context():
+        parent = make_parent().username
+        child = make_child(name="Sam").username
+    parent_client, child_client = app.test_client(), app.test_client()
+    login(parent_client, parent)
+    login(child_client, child)
+    return parent_client, child_client
+
+
+@pytest.fixture
+def open_stream():
+    """Open event streams as unbuffered responses, closing them afterwards.
+
+    Werkzeug runs close callbacks on every close(), so tests leave it to this.
+    """
+    responses = []
+
+    def _open(client, last_event_id=None):
+        headers = {"Last-Event-ID": str(last_event_id)} if last_event_id else {}
+        response = client.get(STREAM_URL, headers=headers, buffered=False)
+        responses.append(response)
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        return response
+
+    yield _open
+    for response in responses:
+        response.close()
+    # Every stream gave its slot back
+    assert events._buffer.streams == 0
+
+
+def _read_events(response, count, timeout=5):
+    """Return the first ``count`` (id, type, data) events on the stream.
+
+    Stops early if the stream ends or ``timeout`` passes; heartbeats keep
+    the chunks coming often enough to check it.
+    """
+    received = []
+    deadline = time.monotonic() + timeout
+    for chunk in response.response:
+        for message in chunk.decode().split("\n\n"):
+            fields = dict(
+                line.split(": ", 1) for line in message.splitlines() if ": " in line
+            )
+            if "event" in fields:
+                received.append(
+                    (fields.get("id"), fields["event"], json.loads(fields["data"]))
+                )
+        if len(received) >= count or time.monotonic() > deadline:
+            break
+    return received
+
+
+def _file_and_resolve(parent, child, count):
+    """File ``count`` withdrawal requests, resolving every other one.
+
+    Returns the (type, request id) events they should produce, in order.
+    """
+    expected = []
+    for i in range(count):
+        created = child.post("/api/withdrawals", json={"amount": 1, "reason": f"e{i}"})
+        request_id = created.get_json()["id"]
+        expected.append(("created", request_id))
+        if i % 2:
+            parent.put(
+                f"/api/admin/requests/{request_id}",
+                json={"status": "approved" if i % 4 == 1 else "denied"},
+            )
+            expected.append(("resolved", request_id))
+    return expected
+
+
+def test_changes_stream_once_and_in_order(stream_clients, open_stream):
+    parent, child = stream_clients
+    response = open_stream(parent)
+    expected = _file_and_resolve(parent, child, 6)
+
+    received = _read_events(response, len(expected))
+    assert [(kind, data["id"]) for _, kind, data in received] == expected
+    ids = [int(event_id) for event_id, _, _ in received]
+    assert ids == sorted(set(ids))
+    assert all(data["child_name"] == "Sam" for _, _, data in received)
+
+
+def test_last_event_id_resumes_with_the_missed_events(stream_clients, open_stream):
+    parent, child = stream_clients
+    response = open_stream(parent)
+    expected = _file_and_resolve(parent, child, 4)
+    received = _read_events(response, len(expected))
+
+    # Resume from the middle: everything after that id, nothing before
+    middle = len(received) // 2
+    missed = [(kind, data["id"]) for _, kind, data in received[middle:]]
+    missed += _file_and_resolve(parent, child, 2)
+    resumed = _read_events(open_stream(parent, received[middle - 1][0]), len(missed))
+    assert [(kind, data["id"]) for _, kind, data in resumed] == missed
+
+
+def test_request_list_gives_the_id_to_resume_from(stream_clients, open_stream):
+    parent, child = stream_clients
+    _file_and_resolve(parent, child, 2)
+    page = parent.get("/api/admin/requests?status=all&limit=50").get_json()
+    listed = {r["id"] for r in page["requests"]}
+
+    expected = _file_and_resolve(parent, child, 2)
+    response = open_stream(parent, page["last_event_id"])
+    received = _read_events(response, len(expected))
+    assert [(kind, data["id"]) for _, kind, data in received] == expected
+    assert not listed & {request_id for _, request_id in expected}
+    # Ids have no holes, which the page relies on to spot missed events
+    ids = [int(event_id) for event_id, _, _ in received]
+    assert ids == list(range(page["last_event_id"] + 1, page["last_event_id"] + 1 + len(ids)))
+
+
+def test_unknown_last_event_id_gets_a_reset(stream_clients, open_stream):
+    parent, _ = stream_clients
+    received = _read_events(open_stream(parent, 10**9), 1)
+    assert [kind for _, kind, _ in received] == ["reset"]
+
+
+def test_stream_ends_after_its_time_limit(app, stream_clients, open_stream, monkeypatch):
+    parent, _ = stream_clients
+    monkeypatch.setitem(app.config, "EVENTS_STREAM_SECONDS", 0.5)
+    response = open_stream(parent)
+    started = time.monotonic()
+    for _ in response.response:
+        assert time.monotonic() - started < 5, "stream never ended"
+    assert time.monotonic() - started >= 0.5
+
+
+def test_stream_over_the_limit_is_told_to_retry_later(
+    app, stream_clients, open_stream, monkeypatch
+):
+    parent, _ = stream_clients
+    monkeypatch.setitem(app.config, "EVENTS_MAX_STREAMS", 1)
+    open_stream(parent)
+    # A 200, not an error status, or EventSource would stop reconnecting
+    busy = open_stream(parent)
+    assert busy.get_data(as_text=True) == f"retry: {BUSY_RETRY_MS}\n\n"
+
+
+def test_events_from_another_process_are_polled(app, stream_clients, open_stream):
+    parent, _ = stream_clients
+    response = open_stream(parent)
+    with app.app_context():
+        database = db.engine.url.database
+    # Written behind the app's back, as another gunicorn worker would
+    with sqlite3.connect(database) as conn:
+        conn.execute(
+            "INSERT INTO request_events (type, request_id, data, created_at)"
+            " VALUES (?, ?, ?, ?)",
+            ("created", 0, json.dumps({"id": 0}), datetime.utcnow().isoformat(" ")),
+        )
+    conn.close()
+
+    received = _read_events(response, 1)
+    assert [(kind, data["id"]) for _, kind, data in received] == [("created", 0)]
+
+
+def test_buffer_reports_events_it_no_longer_holds():
+    buffer = EventBuffer(size=3)
+    buffer.load([])
+    buffer.extend([StreamEvent(i, "created", "{}") for i in range(1, 6)])
+    assert buffer.wait_after(1, timeout=0) is None
+    assert [item.id for item in buffer.wait_after(2, timeout=0)] == [3, 4, 5]
+    assert buffer.wait_after(5, timeout=0) == []
@@ -0,0 +1,61 @@
+"""Streamed exports carry the same running balances as the transaction list."""
+
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+
+from catchup import run_catchup, transactions_with_balance
+from export import COLUMNS
+from models import db
+from money import to_dollars
+
+
+@pytest.fixture
+def exported(app, client, login, make_child):
+    """A caught-up child's expected {id: balance_after}, with the client logged in."""
+    with app.app_context():
+        child = make_child(years=2, starting_balance=-15.0)
+        run_catchup(child)
+        expected = {
+            txn.id: to_dollars(balance_after)
+            for txn, balance_after in db.session.execute(transactions_with_balance(child))
+        }
+        start = child.allowance_start_date + timedelta(days=240)
+        username = child.username
+    login(client, username)
+    return expected, start
+
+
+def _ndjson(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data().splitlines()]
+
+
+def test_export_matches_running_balances(client, exported):
+    expected, _ = exported
+    records = _ndjson(client, "/api/export?format=ndjson")
+    assert {r["id"]: r["balance_after"] for r in records} == expected
+    assert len(records) == len(expected)
+
+
+def test_filtered_export_keeps_running_balances(client, exported):
+    expected, start = exported
+    records = _ndjson(client, f"/api/export?format=ndjson&type=interest&from={start}")
+    assert records
+    for record in records:
+        assert record["type"] == "interest"
+        assert record["created_at"] >= start.isoformat()
+        assert record["balance_after"] == expected[record["id"]]
+
+
+def test_csv_export_has_every_row(client, exported):
+    expected, _ = exported
+    response = client.get("/api/export")
+    assert response.mimetype == "text/csv"
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert tuple(rows[0]) == COLUMNS
+    assert len(rows) - 1 == len(expected)
@@ -0,0 +1,46 @@
+"""Background jobs run in one process, never from the app factory."""
+
+import threading
+
+import jobs
+from app import create_app
+from config import Config
+
+
+def test_app_factory_starts_no_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'jobs.db'}")
+    monkeypatch.setattr(Config, "ACCRUAL_SCHEDULER", True)
+    monkeypatch.setattr(Config, "NTFY_SERVER", "http://127.0.0.1:9")
+    before = set(threading.enumerate())
+    create_app()
+    assert not [t.name for t in set(threading.enumerate()) - before]
+
+
+def test_only_the_lock_holder_runs_jobs(app, tmp_path, monkeypatch):
+    started = []
+    monkeypatch.setattr(jobs, "start_scheduler", lambda app: started.append("scheduler"))
+    monkeypatch.setattr(jobs, "start_sender", lambda app: started.append("sender"))
+    monkeypatch.setattr(jobs, "_lock_file", None)
+    monkeypatch.setitem(app.config, "ACCRUAL_SCHEDULER", True)
+    monkeypatch.setitem(app.config, "NTFY_SERVER", "http://127.0.0.1:9")
+    monkeypatch.setitem(app.config, "JOBS_LOCK_FILE", str(tmp_path / "jobs.lock"))
+
+    jobs.start_jobs(app)
+    assert started == ["scheduler", "sender"]
+    try:
+        # Any other process (or open file) is turned away while it is held
+        assert jobs._try_lock(app.config["JOBS_LOCK_FILE"]) is None
+    finally:
+        jobs._lock_file.close()
+    other = jobs._try_lock(app.config["JOBS_LOCK_FILE"])
+    assert other is not None
+    other.close()
+
+
+def test_no_lock_is_taken_without_jobs(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "_lock_file", None)
+    monkeypatch.setitem(app.config, "ACCRUAL_SCHEDULER", False)
+    monkeypatch.setitem(app.config, "NTFY_SERVER", "")
+    monkeypatch.setitem(app.config, "JOBS_LOCK_FILE", str(tmp_path / "jobs.lock"))
+    jobs.start_jobs(app)
+    assert jobs._lock_file is None
@@ -0,0 +1,93 @@
+"""Parent alerts go through the outbox without slowing requests down."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from models import NotificationOutbox, db
+from notifications import retry_delay, start_sender, stop_sender
+
+STUB_DELAY = 0.5
+
+
+@pytest.fixture
+def ntfy():
+    """A local ntfy stand-in that is slow and rejects its first two posts.
+
+    Yields (server, pushes); pushes collects (title, body) of accepted posts.
+    """
+    pushes = []
+    remaining = [2]
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+            time.sleep(STUB_DELAY)
+            with lock:
+                failed = remaining[0] > 0
+                remaining[0] -= 1
+                if not failed:
+                    pushes.append((self.headers["Title"], body))
+            self.send_response(503 if failed else 200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, pushes
+    server.shutdown()
+
+
+@pytest.fixture
+def sender(app):
+    """Run the outbox sender in this process for one test."""
+    thread = start_sender(app)
+    yield thread
+    stop_sender(thread)
+    assert not thread.is_alive()
+
+
+def test_retry_delay_doubles_up_to_an_hour():
+    assert [retry_delay(n, 5) for n in (1, 2, 3)] == [5, 10, 20]
+    assert retry_delay(30, 5) == 3600
+
+
+def test_slow_failing_ntfy_never_delays_requests(
+    app, client, login, make_child, ntfy, sender, monkeypatch
+):
+    server, pushes = ntfy
+    monkeypatch.setitem(app.config, "NTFY_SERVER", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setitem(app.config, "NTFY_BATCH_SECONDS", 0.2)
+    monkeypatch.setitem(app.config, "NTFY_RETRY_SECONDS", 0.2)
+    with app.app_context():
+        child = make_child(name="Sam")
+        username = child.username
+
+    login(client, username)
+    latencies = []
+    for i in range(10):
+        started = time.perf_counter()
+        response = client.post("/api/withdrawals", json={"amount": 1, "reason": f"n{i}"})
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 201
+    assert max(latencies) < STUB_DELAY
+
+    deadline = time.monotonic() + 30
+    with app.app_context():
+        while db.session.execute(
+            db.select(db.func.count()).select_from(NotificationOutbox)
+        ).scalar():
+            assert time.monotonic() < deadline, "outbox never drained"
+            db.session.rollback()
+            time.sleep(0.05)
+
+    delivered = [line for _, body in pushes for line in body.splitlines()]
+    expected = [f"Sam requested $1.00: n{i}" for i in range(10)]
+    assert sorted(delivered) == sorted(expected)
+    # The burst is combined rather than sent one push per request
+    assert len(pushes) < 10
@@ -0,0 +1,60 @@
+"""Projecting past months reproduces what catch-up wrote to the ledger."""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from catchup import get_balance, run_catchup
+from ledger import add_transaction, signed_amount
+from models import Transaction, db
+from projection import project
+from rollup import next_month
+from schedule import build_schedule, current_rates
+
+
+def _withdraw_monthly(user, cents):
+    """Withdraw ``cents`` at noon on the 1st of every month since the start."""
+    start = user.allowance_start_date
+    day = start if start.day == 1 else next_month(start)
+    while day <= date.today():
+        add_transaction(
+            Transaction(
+                user_id=user.id,
+                type="withdrawal",
+                amount_cents=cents,
+                created_at=datetime(day.year, day.month, day.day, 12),
+            )
+        )
+        day = next_month(day)
+    db.session.commit()
+
+
+@pytest.mark.parametrize("starting_balance", [-15.0, 40.0])
+def test_projection_replays_the_ledger(ctx, make_child, starting_balance):
+    # Two children on the same allowance; one also withdraws every month
+    withdrawals = [0, 2500]
+    users = []
+    for cents in withdrawals:
+        user = make_child(years=3, starting_balance=starting_balance)
+        _withdraw_monthly(user, cents)
+        run_catchup(user)
+        users.append(user)
+
+    start = users[0].allowance_start_date
+    last_month_end = date.today().replace(day=1) - timedelta(days=1)
+    schedule = build_schedule(users[0].monthly_allowance_cents, start, last_month_end)
+    results = project(users[0].starting_balance_cents, schedule, current_rates(), withdrawals)
+    assert len(results) >= 35
+
+    for month, balances, charges in results:
+        for user, balance, charge in zip(users, balances, charges):
+            ledger_charge = db.session.execute(
+                db.select(db.func.coalesce(db.func.sum(signed_amount()), 0)).filter(
+                    Transaction.user_id == user.id,
+                    Transaction.created_at == month.interest_at,
+                )
+            ).scalar()
+            actual = get_balance(user, as_of=month.interest_at)
+            assert (balance, charge) == (actual, ledger_charge), (
+                f"{month.name} {user.username}"
+            )
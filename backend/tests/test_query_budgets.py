@@ -0,0 +1,64 @@
+"""No route runs more SQL statements than its budget once the child is caught up."""
+
+import pytest
+
+from catchup import run_catchup_many
+from instrumentation import query_budget
+from models import User, WithdrawalRequest, db
+
+# (login as, method, URL, JSON body, budget)
+ROUTE_BUDGETS = [
+    ("child", "GET", "/api/dashboard", None, 5),
+    ("child", "GET", "/api/dashboard?days=365", None, 5),
+    ("child", "GET", "/api/transactions", None, 3),
+    ("child", "GET", "/api/transactions?page=5", None, 3),
+    ("child", "GET", "/api/transactions?cursor=&count=1", None, 3),
+    ("child", "GET", "/api/transactions?type=interest", None, 3),
+    ("child", "GET", "/api/withdrawals", None, 2),
+    ("child", "GET", "/api/projection?months=120&withdrawal=10", None, 1),
+    ("child", "POST", "/api/withdrawals", {"amount": 1, "reason": "budget"}, 4),
+    ("parent", "GET", "/api/admin/users", None, 5),
+    ("parent", "GET", "/api/admin/requests", None, 1),
+    ("parent", "GET", "/api/admin/requests?status=all&limit=50", None, 2),
+    ("parent", "PUT", "/api/admin/requests/{request_id}", {"status": "approved"}, 6),
+    ("parent", "POST", "/api/admin/users/{child_id}/adjust", {"amount": 1}, 4),
+    ("parent", "GET", "/api/projection?user_id={child_id}", None, 1),
+]
+
+
+@pytest.fixture
+def budget_users(app, make_child, make_parent):
+    """A parent and a child with one pending request, every child caught up."""
+    with app.app_context():
+        parent = make_parent()
+        child = make_child(years=2, starting_balance=10.0)
+        pending = WithdrawalRequest(user_id=child.id, amount_cents=500, reason="budget")
+        db.session.add(pending)
+        db.session.commit()
+        # The admin user list catches up every child, not only this one
+        run_catchup_many(
+            db.session.execute(db.select(User).filter_by(is_admin=False)).scalars().all()
+        )
+        return {
+            "child": child.username,
+            "parent": parent.username,
+            "child_id": child.id,
+            "request_id": pending.id,
+        }
+
+
+@pytest.mark.parametrize(
+    "who, method, url, body, budget",
+    ROUTE_BUDGETS,
+    ids=[f"{method} {url}" for _, method, url, _, _ in ROUTE_BUDGETS],
+)
+def test_route_stays_within_budget(
+    app, client, login, budget_users, who, method, url, body, budget
+):
+    login(client, budget_users[who])
+    # Budgets are for a logged-in user whose identity is already cached
+    client.get("/api/me")
+    url = url.format(**budget_users)
+    with app.app_context(), query_budget(budget):
+        response = client.open(url, method=method, json=body)
+    assert response.status_code < 400, response.get_json()
@@ -0,0 +1,79 @@
+"""Hot queries must be served by an index, never a full table scan."""
+
+import re
+
+from sqlalchemy import event
+
+from catchup import run_catchup
+from models import WithdrawalRequest, db
+from rollup import compact_all, compact_user
+
+# Tables whose hot queries must always be served by an index
+INDEXED_TABLES = ("transactions", "withdrawal_requests", "monthly_summary")
+_FULL_SCAN = re.compile(
+    rf"^SCAN ({'|'.join(INDEXED_TABLES)})(_\d+)?\b(?!.*USING (COVERING )?INDEX)"
+)
+
+
+def _exercise_api(client, login, child, parent):
+    login(client, child.username)
+    client.get("/api/dashboard")
+    for days in (30, 365):
+        client.get(f"/api/dashboard?days={days}")
+    client.get("/api/transactions?page=3")
+    client.get("/api/transactions?type=interest")
+    for txn_type in ("", "interest"):
+        page = client.get(f"/api/transactions?cursor=&count=1&type={txn_type}")
+        cursor = page.get_json()["next_cursor"]
+        client.get(f"/api/transactions?cursor={cursor}&type={txn_type}")
+    client.post("/api/withdrawals", json={"amount": 1, "reason": "plans"})
+    client.get("/api/withdrawals")
+    client.get("/api/export?from=2000-01-01&type=interest").get_data()
+
+    login(client, parent.username)
+    client.get("/api/admin/users")
+    client.get("/api/admin/requests")
+    client.get("/api/admin/requests?status=all")
+    request_id = client.get("/api/admin/requests").get_json()[0]["id"]
+    client.put(f"/api/admin/requests/{request_id}", json={"status": "approved"})
+    client.post(f"/api/admin/users/{child.id}/adjust", json={"amount": 1})
+    client.get("/api/admin/export?format=ndjson").get_data()
+
+
+def test_hot_queries_use_indexes(ctx, client, login, make_child, make_parent):
+    parent = make_parent()
+    child = make_child(years=2, starting_balance=10.0)
+    db.session.add(WithdrawalRequest(user_id=child.id, amount_cents=500, reason="plans"))
+    db.session.commit()
+    run_catchup(make_child(years=1), bulk=False)
+    # Summarize the child's closed months so the endpoints read summaries
+    run_catchup(child)
+    compact_user(child)
+    db.session.commit()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        _exercise_api(client, login, child, parent)
+        run_catchup(make_child(years=1))
+        run_catchup(make_child(years=1), bulk=False)
+        compact_all()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    scans = {}
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            if statement in scans:
+                continue
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            scans[statement] = [row[-1] for row in plan if _FULL_SCAN.match(row[-1])]
+
+    assert len(scans) > 20
+    full_scans = {" ".join(s.split()): found for s, found in scans.items() if found}
+    assert not full_scans
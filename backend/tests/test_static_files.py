@@ -0,0 +1,85 @@
+"""Serving a stand-in frontend build from the startup index."""
+
+import gzip
+
+import pytest
+from flask import Flask
+
+from static_files import init_static
+
+ASSET = "/_app/immutable/entry/start.abc123.js"
+SCRIPT = b"export const answer = 42;\n" * 400
+
+
+@pytest.fixture(scope="module")
+def static_client(tmp_path_factory):
+    """A client for an app serving only a small build with precompressed assets."""
+    root = tmp_path_factory.mktemp("build")
+    files = {
+        "200.html": b"<!doctype html><title>Allowance</title>",
+        "favicon.png": b"\x89PNG stand-in",
+        "_app/version.json": b'{"version":"1"}',
+        ASSET.lstrip("/"): SCRIPT,
+        # No brotli encoder in the standard library; only negotiation is checked
+        ASSET.lstrip("/") + ".br": b"brotli stand-in",
+        ASSET.lstrip("/") + ".gz": gzip.compress(SCRIPT),
+    }
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    app = Flask(__name__, static_folder=None)
+    app.config["STATIC_FOLDER"] = str(root)
+    init_static(app)
+    return app.test_client()
+
+
+def test_brotli_is_preferred(static_client):
+    response = static_client.get(ASSET, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.data == b"brotli stand-in"
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_gzip_variant(static_client):
+    response = static_client.get(ASSET, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == SCRIPT
+
+
+def test_identity_without_accept_encoding(static_client):
+    response = static_client.get(ASSET)
+    assert "Content-Encoding" not in response.headers
+    assert response.data == SCRIPT
+
+
+def test_hashed_assets_are_immutable_for_a_year(static_client):
+    response = static_client.get(ASSET)
+    directives = set(response.headers["Cache-Control"].replace(" ", "").split(","))
+    assert {"immutable", "public", "max-age=31536000"} <= directives
+
+
+def test_matching_etag_is_not_modified(static_client):
+    etag = static_client.get(ASSET).headers["ETag"]
+    response = static_client.get(ASSET, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert not response.data
+
+
+def test_range_request(static_client):
+    response = static_client.get(ASSET, headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.data == SCRIPT[:10]
+    assert response.headers["Content-Range"] == f"bytes 0-9/{len(SCRIPT)}"
+
+
+def test_spa_fallback_must_revalidate(static_client):
+    response = static_client.get("/admin/requests")
+    assert response.status_code == 200
+    assert response.data.startswith(b"<!doctype html>")
+    assert "no-cache" in response.headers["Cache-Control"]
+
+
+def test_missing_asset_is_not_found(static_client):
+    assert static_client.get("/_app/immutable/nope.js").status_code == 404
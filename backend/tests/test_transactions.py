@@ -0,0 +1,46 @@
+"""Keyset pages of /api/transactions carry the same running balances as offset pages."""
+
+from catchup import run_catchup
+from models import db
+from pagination import decode_cursor, encode_cursor
+
+
+def _cursor_pages(client, cursor=""):
+    """Follow next_cursor from ``cursor``; return every transaction seen."""
+    seen = []
+    while cursor is not None:
+        page = client.get(f"/api/transactions?cursor={cursor}&per_page=25").get_json()
+        seen += page["transactions"]
+        cursor = page["next_cursor"]
+    return seen
+
+
+def test_cursor_pages_match_offset_pages(app, client, login, make_child):
+    with app.app_context():
+        child = make_child(years=1, starting_balance=-15.0)
+        run_catchup(child)
+        db.session.commit()
+        username = child.username
+    login(client, username)
+
+    offset = client.get("/api/transactions?per_page=1000").get_json()["transactions"]
+    assert len(offset) > 50
+    assert _cursor_pages(client) == offset
+
+
+def test_forged_cursor_balance_is_ignored(app, client, login, make_child):
+    with app.app_context():
+        child = make_child(years=1)
+        run_catchup(child)
+        db.session.commit()
+        username = child.username
+    login(client, username)
+
+    first = client.get("/api/transactions?cursor=&per_page=25").get_json()
+    expected = _cursor_pages(client, first["next_cursor"])
+
+    # Earlier cursors carried the running balance; a client could change it
+    created_at, txn_id, state = decode_cursor(first["next_cursor"])
+    state["b"] = 10**9
+    forged = encode_cursor(created_at, txn_id, **state)
+    assert _cursor_pages(client, forged) == expected
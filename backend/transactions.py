@@ -1,36 +1,140 @@
+import math
+
 from flask import Blueprint, request
 from flask_login import current_user, login_required
 
-from catchup import annotate_running_balance, run_catchup
+from catchup import (
+    balance_before_position,
+    get_balance,
+    run_catchup,
+    transactions_with_balance,
+    txn_with_balance,
+)
+from conditional import ledger_conditional
+from ledger import CREDIT_TYPES, DEBIT_TYPES, balance_delta
 from models import Transaction, db
+from pagination import before, decode_cursor, encode_cursor
 
 transactions_bp = Blueprint("transactions", __name__)
 
+# (user_id, type filter) -> (ledger_version, count)
+_count_cache = {}
+
 
 @transactions_bp.route("/api/transactions")
 @login_required
+@ledger_conditional
 def list_transactions():
+    """List the user's transactions, newest first, with running balances.
+
+    Pass ``cursor`` (empty for the first page) for keyset pagination; the
+    response then carries ``next_cursor`` and includes ``total`` only when
+    ``count=1``. Otherwise ``page``/``per_page`` offset pagination is used.
+    """
     run_catchup(current_user)
 
-    page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
-    txn_type = request.args.get("type", None)
+    txn_type = request.args.get("type") or None
+    if per_page < 1:
+        per_page = 20
+    # Also keeps arbitrary strings out of _count_cache
+    if txn_type and txn_type not in CREDIT_TYPES + DEBIT_TYPES:
+        return {"error": f"Unknown type: {txn_type!r}"}, 400
 
-    stmt = db.select(Transaction).filter_by(user_id=current_user.id)
-    if txn_type:
-        stmt = stmt.filter_by(type=txn_type)
+    if "cursor" in request.args:
+        return _cursor_page(request.args["cursor"], per_page, txn_type)
 
-    stmt = stmt.order_by(Transaction.created_at.desc())
-    pagination = db.paginate(stmt, page=page, per_page=per_page, error_out=False)
+    page = request.args.get("page", 1, type=int)
+    if page < 1:
+        page = 1
+
+    total = _count(current_user, txn_type)
 
-    # Annotate with running balance (items are desc, reverse to asc, annotate, reverse back)
-    items = list(reversed(pagination.items))
-    annotated = annotate_running_balance(current_user, items)
-    annotated.reverse()
+    # Rows come back newest first with balance_after already computed
+    rows = db.session.execute(
+        transactions_with_balance(current_user, txn_type)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    ).all()
 
     return {
-        "transactions": annotated,
-        "total": pagination.total,
-        "page": pagination.page,
-        "pages": pagination.pages,
+        "transactions": [
+            txn_with_balance(txn, balance_after) for txn, balance_after in rows
+        ],
+        "total": total,
+        "page": page,
+        "pages": math.ceil(total / per_page),
     }
+
+
+def _cursor_page(cursor, per_page, txn_type):
+    after = None
+    if cursor:
+        try:
+            created_at, txn_id, state = decode_cursor(cursor)
+        except ValueError:
+            return {"error": "Invalid cursor"}, 400
+        if state.get("type") != txn_type:
+            return {"error": "Cursor does not match the type filter"}, 400
+        after = (created_at, txn_id)
+
+    if txn_type:
+        # Rows of other types sit between these, so the balance cannot be
+        # carried from the cursor; compute it in the query instead
+        rows = db.session.execute(
+            transactions_with_balance(current_user, txn_type, after).limit(per_page + 1)
+        ).all()
+    else:
+        # Unfiltered pages walk the ledger backwards from the balance after
+        # the newest row on the page: the stored balance, or for later pages
+        # the sum up to the cursor (never a balance the client sent back)
+        stmt = db.select(Transaction).filter_by(user_id=current_user.id)
+        if after:
+            stmt = stmt.filter(before(Transaction, *after))
+        txns = db.session.execute(
+            stmt.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(
+                per_page + 1
+            )
+        ).scalars().all()
+        if after:
+            running = balance_before_position(current_user, *after)
+        else:
+            running = get_balance(current_user)
+        rows = []
+        for txn in txns:
+            rows.append((txn, running))
+            running -= balance_delta(txn.type, txn.amount_cents)
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last, _ = rows[per_page - 1]
+        next_cursor = encode_cursor(last.created_at, last.id, type=txn_type)
+        rows = rows[:per_page]
+
+    result = {
+        "transactions": [
+            txn_with_balance(txn, balance_after) for txn, balance_after in rows
+        ],
+        "next_cursor": next_cursor,
+    }
+    if request.args.get("count", type=int):
+        result["total"] = _count(current_user, txn_type)
+    return result
+
+
+def _count(user, txn_type):
+    """Return the user's (optionally type-filtered) transaction count.
+
+    Cached until the user's ledger_version changes.
+    """
+    key = (user.id, txn_type)
+    cached = _count_cache.get(key)
+    if cached and cached[0] == user.ledger_version:
+        return cached[1]
+
+    stmt = db.select(db.func.count()).select_from(Transaction).filter_by(user_id=user.id)
+    if txn_type:
+        stmt = stmt.filter_by(type=txn_type)
+    total = db.session.execute(stmt).scalar()
+    _count_cache[key] = (user.ledger_version, total)
+    return total
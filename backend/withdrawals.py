@@ -1,7 +1,12 @@
 from flask import Blueprint, request
 from flask_login import current_user, login_required
 
+from conditional import ledger_conditional
+from database import retry_on_locked
+from events import publish_request_event
+from ledger import touch_ledger
 from models import WithdrawalRequest, db
+from money import to_cents, to_dollars
 from notifications import notify_parent
 
 withdrawals_bp = Blueprint("withdrawals", __name__)
@@ -9,33 +14,36 @@ withdrawals_bp = Blueprint("withdrawals", __name__)
 
 @withdrawals_bp.route("/api/withdrawals", methods=["POST"])
 @login_required
+@retry_on_locked
 def create_withdrawal():
     data = request.get_json()
     if not data or not data.get("amount"):
         return {"error": "Amount is required"}, 400
 
-    amount = float(data["amount"])
-    if amount <= 0:
+    amount_cents = to_cents(data["amount"])
+    if amount_cents <= 0:
         return {"error": "Amount must be positive"}, 400
 
     wr = WithdrawalRequest(
         user_id=current_user.id,
-        amount=round(amount, 2),
+        amount_cents=amount_cents,
         reason=data.get("reason", ""),
     )
     db.session.add(wr)
-    db.session.commit()
-
+    touch_ledger(current_user.id)
     notify_parent(
         "Withdrawal Request",
-        f"{current_user.display_name} requested ${wr.amount:.2f}: {wr.reason}",
+        f"{current_user.display_name} requested ${to_dollars(wr.amount_cents):.2f}: {wr.reason}",
     )
+    publish_request_event("created", wr, current_user.display_name)
+    db.session.commit()
 
     return wr.to_dict(), 201
 
 
 @withdrawals_bp.route("/api/withdrawals")
 @login_required
+@ledger_conditional
 def list_withdrawals():
     requests_list = db.session.execute(
         db.select(WithdrawalRequest)
@@ -12,5 +12,21 @@ flask seed --admin-username "${ADMIN_USERNAME:-parent}" \
            --admin-password "${ADMIN_PASSWORD:-changeme}" \
     2>/dev/null || true
 
-# Start the server
-exec gunicorn -w 1 -b 0.0.0.0:5000 "app:create_app()"
+# Workers share Prometheus metrics through files here; start from zero.
+# Only the workers' own files are removed, in case the directory is shared.
+export METRICS_DIR="${METRICS_DIR:-/tmp/allowance-metrics}"
+mkdir -p "$METRICS_DIR"
+rm -f "$METRICS_DIR"/*.json "$METRICS_DIR"/*.json.tmp
+
+# Request event streams stay open while a parent's requests page is. gevent
+# workers hold each one as a greenlet instead of a thread, so many can be
+# open at once; gthread workers cap them at EVENTS_MAX_STREAMS per worker.
+WORKER_CLASS="${GUNICORN_WORKER_CLASS:-gthread}"
+if [ "$WORKER_CLASS" = gevent ]; then
+    export EVENTS_MAX_STREAMS="${EVENTS_MAX_STREAMS:-500}"
+fi
+
+# Start the server. SQLite runs in WAL mode, so several workers and threads
+# can share the database file.
+exec gunicorn -k "$WORKER_CLASS" -w "${GUNICORN_WORKERS:-2}" \
+    --threads "${GUNICORN_THREADS:-4}" -b 0.0.0.0:5000 "app:create_app()"
@@ -4,7 +4,9 @@ import adapter from '@sveltejs/adapter-static';
 const config = {
     kit: {
         adapter: adapter({
-            fallback: '200.html'
+            fallback: '200.html',
+            // Write .br/.gz copies that the backend serves to clients that accept them
+            precompress: true
         })
     }
 };